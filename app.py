@@ -1,6 +1,12 @@
+import uuid
 import streamlit as st
 from chatbot import custom_sql_agent
 from states.agent_state import AgentState
+from utils.format_final_response import FINAL_ANSWER_TAG
+from utils.result_pager import ResultPager
+from utils.report_worker import report_worker
+from utils.tracing import span
+from config import REPORT_PREFETCH, REPORT_TIMEOUT_SECONDS
 from langchain_core.messages import AIMessage, HumanMessage
 
 st.set_page_config(layout='wide', page_title='AI Chatbot', page_icon='💐')
@@ -8,6 +14,66 @@ st.set_page_config(layout='wide', page_title='AI Chatbot', page_icon='💐')
 if 'message_history' not in st.session_state:
     st.session_state.message_history = [AIMessage(content="Hiya, Im the AI chatbot. How can I help?")]
 
+# Query results per assistant message (index in message_history), paged on demand
+if 'result_pagers' not in st.session_state:
+    st.session_state.result_pagers = {}
+
+# PDF report inputs per assistant message, built in the background by report_worker
+if 'reports' not in st.session_state:
+    st.session_state.reports = {}
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def render_result_viewer(pager: ResultPager, key: str):
+    result = pager.result
+    with st.expander(f"Query result ({result.row_count} rows)", expanded=True):
+        filter_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+        filter_text = filter_col.text_input("Filter", key=f"{key}_filter", placeholder="Contains…")
+        sort_by = sort_col.selectbox("Sort by", [None] + result.columns, key=f"{key}_sort",
+                                     format_func=lambda c: "—" if c is None else c)
+        descending = order_col.toggle("Desc", key=f"{key}_desc")
+        page_size = size_col.selectbox("Rows", PAGE_SIZES, key=f"{key}_size")
+
+        view_options = dict(sort_by=sort_by, descending=descending, filter_text=filter_text)
+        page_count = pager.page_count(page_size, **view_options)
+        # Back to the first page when the view changes, so the stored page never exceeds page_count
+        view = (filter_text, sort_by, descending, page_size)
+        if st.session_state.get(f"{key}_view") != view:
+            st.session_state[f"{key}_view"] = view
+            st.session_state[f"{key}_page"] = 1
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, key=f"{key}_page")
+        # Only the requested page is materialised and sent to the browser
+        st.dataframe(pager.page(page, page_size, **view_options).to_dataframe(), use_container_width=True, hide_index=True)
+
+
+def render_report_download(report: dict, key: str):
+    report_id = report["id"]
+    if not report_worker.is_ready(report_id) and not st.session_state.get(f"{key}_requested"):
+        if st.button("📄 Prepare PDF Report", key=f"{key}_prepare"):
+            st.session_state[f"{key}_requested"] = True
+        else:
+            return
+    # Re-submitting is a no-op when the report is already queued or cached
+    report_worker.submit(report_id, report["user_query"], report["analysis"], report["result"])
+    with st.spinner("Building PDF report..."):
+        pdf_bytes = report_worker.get(report_id, timeout=REPORT_TIMEOUT_SECONDS)
+    if pdf_bytes:
+        st.download_button(
+            label="📄 Download PDF Report",
+            data=pdf_bytes,
+            file_name="query_report.pdf",
+            mime="application/pdf",
+            key=f"{key}_download"
+        )
+    elif report_worker.is_running(report_id):
+        st.warning("The PDF report is taking longer than expected.")
+        # A hung build cannot be stopped; it is abandoned and the report submitted again on the rerun
+        st.button("🔄 Retry PDF Report", key=f"{key}_retry", on_click=report_worker.discard, args=(report_id,))
+    else:
+        st.session_state[f"{key}_requested"] = False
+        st.warning("Could not build the PDF report.")
+
 left_col, main_col, right_col = st.columns([1, 2, 1])
 
 # 1. Buttons for chat - Clear Button
@@ -15,6 +81,8 @@ left_col, main_col, right_col = st.columns([1, 2, 1])
 with left_col:
     if st.button('Clear Chat'):
         st.session_state.message_history = []
+        st.session_state.result_pagers = {}
+        st.session_state.reports = {}
 
 
 # 2. Chat history and input
@@ -25,21 +93,41 @@ with main_col:
         st.session_state.message_history.append(HumanMessage(content=user_input))
     # Summary of annotation details associated with the 'Finance' hierarchy and added in the current month
         final_response = ""
-        for step in custom_sql_agent.stream(
-            AgentState(user_query=  user_input),
-            stream_mode="updates"
-        ):  
-            print(step)
-            final_response = step
+        # Stream tokens of the final summarisation call while graph updates arrive
+        streamed_placeholder = st.empty()
+        streamed_text = ""
+        # One trace per question; nodes and external calls are recorded as child spans
+        with span("request", kind="request", user_query=user_input):
+            for mode, chunk in custom_sql_agent.stream(
+                AgentState(user_query=  user_input),
+                stream_mode=["updates", "messages"]
+            ):  
+                if mode == "messages":
+                    message_chunk, metadata = chunk
+                    if FINAL_ANSWER_TAG in (metadata.get("tags") or []) and message_chunk.content:
+                        streamed_text += message_chunk.content
+                        streamed_placeholder.chat_message('assistant').markdown(f"Query executed successfully \n\n*Processed Results:* {streamed_text}▌")
+                    continue
+                print(chunk)
+                final_response = chunk
+        # The full message is rendered with the history below
+        streamed_placeholder.empty()
 
         st.session_state.message_history.append(final_response["respond"]["final_response"])
-        if "pdf_bytes" in final_response["respond"] and final_response["respond"]["pdf_bytes"]:
-            st.download_button(
-                label="📄 Download PDF Report",
-                data=final_response["respond"]["pdf_bytes"],
-                file_name="query_report.pdf",
-                mime="application/pdf"
-            )
+        message_index = len(st.session_state.message_history) - 1
+        if final_response["respond"].get("query_result"):
+            st.session_state.result_pagers[message_index] = ResultPager(final_response["respond"]["query_result"])
+        if final_response["respond"].get("processed_result"):
+            report = {
+                "id": uuid.uuid4().hex,
+                "user_query": user_input,
+                "analysis": final_response["respond"]["processed_result"],
+                "result": final_response["respond"].get("query_result"),
+            }
+            st.session_state.reports[message_index] = report
+            if REPORT_PREFETCH:
+                # Build while the answer is displayed, the download is then instant
+                report_worker.submit(report["id"], report["user_query"], report["analysis"], report["result"])
 
     for i in range(1, len(st.session_state.message_history) + 1):
         this_message = st.session_state.message_history[-i]
@@ -47,4 +135,11 @@ with main_col:
             message_box = st.chat_message('assistant')
         else:
             message_box = st.chat_message('user')
-        message_box.markdown(this_message.content)
\ No newline at end of file
+        message_box.markdown(this_message.content)
+        message_index = len(st.session_state.message_history) - i
+        if message_index in st.session_state.result_pagers:
+            with message_box:
+                render_result_viewer(st.session_state.result_pagers[message_index], key=f"result_{message_index}")
+        if message_index in st.session_state.reports:
+            with message_box:
+                render_report_download(st.session_state.reports[message_index], key=f"report_{message_index}")
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Latency benchmark: memory-mapped NumPy few-shot index vs. the Chroma MMR path.
+
+Uses synthetic unit vectors (no Ollama needed) so only retrieval cost is measured.
+
+    python -m benchmarks.bench_few_shot_index
+    python -m benchmarks.bench_few_shot_index --sizes 40 10000 --queries 50
+
+The 1M-example run needs ~3 GB of disk/page cache for the matrix at dim 768;
+Chroma ingestion at that size takes a long time, use --chroma-max-size to skip it.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from utils.few_shot_index import NumpyFewShotIndex, EMBEDDINGS_FILE
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+def build_numpy_index(vectors: np.ndarray, index_dir: str) -> NumpyFewShotIndex:
+    np.save(f"{index_dir}/{EMBEDDINGS_FILE}", vectors)
+    documents = [{"page_content": f"example {i}", "metadata": {}} for i in range(len(vectors))]
+    return NumpyFewShotIndex(np.load(f"{index_dir}/{EMBEDDINGS_FILE}", mmap_mode="r"), documents)
+
+
+def build_chroma_store(vectors: np.ndarray):
+    import chromadb
+    from langchain_chroma import Chroma
+
+    client = chromadb.EphemeralClient()
+    store = Chroma(collection_name=f"bench_{len(vectors)}", client=client)
+    batch = 5000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        store._collection.add(
+            ids=[str(i) for i in range(start, start + len(chunk))],
+            embeddings=chunk.tolist(),
+            documents=[f"example {i}" for i in range(start, start + len(chunk))],
+        )
+    return store
+
+
+def time_queries(search, queries) -> list:
+    search(queries[0])  # warm-up (page in the mmap, build HNSW caches)
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, size, timings):
+    print(
+        f"{name:<8} n={size:<9} mean={statistics.mean(timings) * 1000:8.3f} ms  "
+        f"p50={percentile(timings, 50):8.3f} ms  p95={percentile(timings, 95):8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 10_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768, help="nomic-embed-text dimension")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--chroma-max-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = build_numpy_index(vectors, index_dir)
+            timings = time_queries(
+                lambda q: index.max_marginal_relevance_search_by_vector(q, k=args.k, fetch_k=args.fetch_k),
+                queries,
+            )
+            report("numpy", size, timings)
+            del index
+
+        if size <= args.chroma_max_size:
+            store = build_chroma_store(vectors)
+            timings = time_queries(
+                lambda q: store.max_marginal_relevance_search_by_vector(q.tolist(), k=args.k, fetch_k=args.fetch_k),
+                queries,
+            )
+            report("chroma", size, timings)
+        else:
+            print(f"chroma   n={size:<9} skipped (--chroma-max-size {args.chroma_max_size})")
+
+
+if __name__ == "__main__":
+    main()
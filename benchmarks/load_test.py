@@ -0,0 +1,375 @@
+"""
+Concurrent load test for `chatbot.custom_sql_agent` against a simulated Ollama.
+
+N sessions ask FAQ.py questions back to back (with exponential think time)
+through the compiled graph; load ramps through the given concurrency stages.
+External services are the offline stand-ins of benchmarks/standins.py, and
+every LLM/embedding call goes through a simulated Ollama server with a fixed
+number of parallel slots (OLLAMA_NUM_PARALLEL) whose service time is
+
+    prefill:  lognormal base latency + prompt_tokens / prefill tokens/s
+    decode:   completion_tokens / generation tokens/s (normal, per call)
+
+Per stage it reports throughput, end-to-end p50/p99, Ollama queue wait and
+utilization, and per-node p99 latency and queue wait; the saturation point is
+the first stage where added sessions stop adding throughput, and per node the
+first stage where its p99 exceeds `--node-slowdown` x its single-session p99.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --mode async --concurrency 1 4 16 64 --stage-seconds 60
+    python -m benchmarks.load_test --llm-parallel 4 --decode-tps 40 --json load.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.standins import (
+    Cassette,
+    build_seed_database,
+    current_question,
+    install_sqlite_pool,
+    install_standins,
+    synthesize_faq_response,
+)
+from benchmarks.replay_benchmark import DEFAULT_CASSETTE, configure, percentile
+
+# Typical completion lengths per node (tokens); the cassette's short synthesized
+# answers would otherwise make decoding unrealistically cheap
+DEFAULT_COMPLETION_TOKENS = {
+    "analyze_query": 120,
+    "generate_sql": 150,
+    "respond": 300,
+    "analyze_schema": 200,
+}
+
+
+class SimulatedOllama:
+    """
+    Latency and queueing model of one Ollama deployment.
+
+    `parallel` slots are shared by chat and embedding calls; a call waits for a
+    free slot (queue wait), then holds it for its sampled service time.
+    """
+
+    def __init__(self, parallel: int, ttft_ms: float, ttft_sigma: float, prefill_tps: float,
+                 decode_tps: float, decode_cv: float, embed_ms: float, completion_tokens: dict,
+                 completion_sigma: float, seed: int = 0):
+        self.parallel = parallel
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.decode_cv = decode_cv
+        self.embed_ms = embed_ms
+        self.completion_tokens = completion_tokens
+        self.completion_sigma = completion_sigma
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(parallel)
+        self._async_slots = None
+        self._records_lock = threading.Lock()
+        self.records = []
+
+    def _sample(self, node: str, prompt_tokens: int, completion_tokens: int, kind: str):
+        with self._rng_lock:
+            if kind == "embedding":
+                return self.embed_ms / 1000 * self._rng.lognormvariate(0, 0.2), 0
+            median = self.completion_tokens.get(node, completion_tokens)
+            tokens = max(int(self._rng.lognormvariate(math.log(max(median, 1)), self.completion_sigma)), 1)
+            decode_tps = max(self._rng.gauss(self.decode_tps, self.decode_tps * self.decode_cv), 1.0)
+            ttft = self.ttft_ms / 1000 * self._rng.lognormvariate(0, self.ttft_sigma)
+        return ttft + prompt_tokens / self.prefill_tps + tokens / decode_tps, tokens
+
+    def _record(self, node: str, kind: str, queued_at: float, started_at: float, service: float):
+        with self._records_lock:
+            self.records.append({"node": node, "kind": kind, "queue_wait": started_at - queued_at, "service": service})
+
+    def serve(self, node: str, prompt_tokens: int, completion_tokens: int, kind: str = "chat") -> int:
+        service, tokens = self._sample(node, prompt_tokens, completion_tokens, kind)
+        queued_at = time.perf_counter()
+        with self._slots:
+            started_at = time.perf_counter()
+            time.sleep(service)
+        self._record(node, kind, queued_at, started_at, service)
+        return tokens
+
+    async def aserve(self, node: str, prompt_tokens: int, completion_tokens: int, kind: str = "chat") -> int:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.parallel)
+        service, tokens = self._sample(node, prompt_tokens, completion_tokens, kind)
+        queued_at = time.perf_counter()
+        async with self._async_slots:
+            started_at = time.perf_counter()
+            await asyncio.sleep(service)
+        self._record(node, kind, queued_at, started_at, service)
+        return tokens
+
+    def drain(self) -> list:
+        with self._records_lock:
+            records, self.records = self.records, []
+        # asyncio primitives bind to one event loop; each async stage runs its own
+        self._async_slots = None
+        return records
+
+
+class MemorySink:
+    """Collects finished spans in memory instead of the JSONL file."""
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._records = []
+
+    def write(self, record: dict):
+        with self._lock:
+            self._records.append(record)
+
+    def drain(self) -> list:
+        with self._lock:
+            records, self._records = self._records, []
+        return records
+
+
+class Session:
+    def __init__(self, questions, think_time: float, seed: int):
+        self.questions = questions
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+
+    def next_question(self) -> dict:
+        return self.rng.choice(self.questions)
+
+    def think(self) -> float:
+        return self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0.0
+
+
+def run_threaded_stage(agent, AgentState, span, questions, concurrency, stage_seconds, think_time, seed):
+    """Streamlit-style deployment: every session is a thread running the sync graph."""
+    deadline = time.perf_counter() + stage_seconds
+    errors = []
+
+    def session_loop(index):
+        session = Session(questions, think_time, seed + index)
+        while time.perf_counter() < deadline:
+            item = session.next_question()
+            token = current_question.set(item)
+            try:
+                with span("request", kind="request", question=item["question"]):
+                    agent.invoke(AgentState(user_query=item["question"]))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            finally:
+                current_question.reset(token)
+            time.sleep(min(session.think(), max(deadline - time.perf_counter(), 0)))
+
+    threads = [threading.Thread(target=session_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def run_async_stage(agent, AgentState, span, questions, concurrency, stage_seconds, think_time, seed):
+    """Async worker deployment: every session is a task on one event loop (`ainvoke`)."""
+    errors = []
+
+    async def session_loop(index, deadline):
+        session = Session(questions, think_time, seed + index)
+        while time.perf_counter() < deadline:
+            item = session.next_question()
+            token = current_question.set(item)
+            try:
+                with span("request", kind="request", question=item["question"]):
+                    await agent.ainvoke(AgentState(user_query=item["question"]))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            finally:
+                current_question.reset(token)
+            await asyncio.sleep(min(session.think(), max(deadline - time.perf_counter(), 0)))
+
+    async def stage():
+        deadline = time.perf_counter() + stage_seconds
+        await asyncio.gather(*(session_loop(i, deadline) for i in range(concurrency)))
+
+    asyncio.run(stage())
+    return errors
+
+
+def summarize_stage(concurrency, wall_seconds, spans, llm_records, parallel, errors) -> dict:
+    requests = [s for s in spans if s["kind"] == "request"]
+    latencies = [s["duration_ms"] for s in requests if not s["error"]]
+
+    node_latency = defaultdict(list)
+    for s in spans:
+        if s["kind"] == "node":
+            node_latency[s["name"]].append(s["duration_ms"])
+
+    node_wait = defaultdict(list)
+    for record in llm_records:
+        node_wait[record["node"]].append(record["queue_wait"] * 1000)
+    busy = sum(record["service"] for record in llm_records)
+
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": wall_seconds,
+        "completed": len(latencies),
+        "failed": len(requests) - len(latencies),
+        "errors": sorted(set(errors))[:5],
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "latency_ms": {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99)},
+        "ollama": {
+            "calls": len(llm_records),
+            "queue_wait_ms": {
+                "p50": percentile([r["queue_wait"] * 1000 for r in llm_records], 50),
+                "p99": percentile([r["queue_wait"] * 1000 for r in llm_records], 99),
+            },
+            "utilization": min(busy / (wall_seconds * parallel), 1.0) if wall_seconds else 0.0,
+        },
+        "nodes": {
+            name: {
+                "calls": len(values),
+                "p50_ms": percentile(values, 50),
+                "p99_ms": percentile(values, 99),
+                "queue_wait_p99_ms": percentile(node_wait.get(name, []), 99) if node_wait.get(name) else 0.0,
+            }
+            for name, values in sorted(node_latency.items())
+        },
+    }
+
+
+def find_saturation(stages: list, min_gain: float, node_slowdown: float) -> dict:
+    """First stage whose throughput gain over the previous stage is below `min_gain`, and per node
+    the first stage where its p99 exceeds `node_slowdown` x its lowest-concurrency p99."""
+    overall = None
+    for previous, current in zip(stages, stages[1:]):
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            overall = current["concurrency"]
+            break
+
+    per_node = {}
+    for name in sorted({name for stage in stages for name in stage["nodes"]}):
+        # Baseline: the lowest concurrency stage the node ran in
+        appearances = [stage for stage in stages if name in stage["nodes"]]
+        baseline = appearances[0]["nodes"][name]["p99_ms"]
+        per_node[name] = next(
+            (stage["concurrency"] for stage in appearances[1:]
+             if baseline > 0 and stage["nodes"][name]["p99_ms"] > baseline * node_slowdown),
+            None,
+        )
+    return {"concurrency": overall, "nodes": per_node}
+
+
+def print_stage(stage: dict):
+    ollama = stage["ollama"]
+    print(
+        f"\nconcurrency={stage['concurrency']:<4} completed={stage['completed']:<5} failed={stage['failed']:<3} "
+        f"throughput={stage['throughput_rps']:6.2f} req/s  p50={stage['latency_ms']['p50']:9.1f} ms  "
+        f"p99={stage['latency_ms']['p99']:9.1f} ms"
+    )
+    print(
+        f"  ollama: calls={ollama['calls']} utilization={ollama['utilization']:.0%} "
+        f"queue wait p50={ollama['queue_wait_ms']['p50']:.1f} ms p99={ollama['queue_wait_ms']['p99']:.1f} ms"
+    )
+    for name, stats in stage["nodes"].items():
+        print(
+            f"  {name:<28} p50={stats['p50_ms']:9.1f} ms  p99={stats['p99_ms']:9.1f} ms  "
+            f"queue wait p99={stats['queue_wait_p99_ms']:9.1f} ms"
+        )
+    for error in stage["errors"]:
+        print(f"  error: {error[:160]}")
+
+
+def parse_completion_tokens(values) -> dict:
+    tokens = dict(DEFAULT_COMPLETION_TOKENS)
+    for value in values or []:
+        node, _, count = value.partition("=")
+        tokens[node] = int(count)
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread",
+                        help="thread = Streamlit sessions on the sync graph, async = tasks on ainvoke")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="sessions per stage")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a session's questions")
+    parser.add_argument("--llm-parallel", type=int, default=1, help="OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--ttft-ms", type=float, default=250, help="median base latency per call")
+    parser.add_argument("--ttft-sigma", type=float, default=0.4, help="lognormal sigma of the base latency")
+    parser.add_argument("--prefill-tps", type=float, default=800, help="prompt tokens/s")
+    parser.add_argument("--decode-tps", type=float, default=30, help="mean generated tokens/s")
+    parser.add_argument("--decode-cv", type=float, default=0.15, help="coefficient of variation of decode tokens/s")
+    parser.add_argument("--completion-tokens", nargs="*", metavar="NODE=N",
+                        help=f"median completion tokens per node (default {DEFAULT_COMPLETION_TOKENS})")
+    parser.add_argument("--completion-sigma", type=float, default=0.35)
+    parser.add_argument("--embed-ms", type=float, default=30, help="median embedding call latency")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which load is saturated")
+    parser.add_argument("--node-slowdown", type=float, default=2.0)
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write per-stage results to this file")
+    args = parser.parse_args()
+
+    server = SimulatedOllama(
+        parallel=args.llm_parallel, ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma,
+        prefill_tps=args.prefill_tps, decode_tps=args.decode_tps, decode_cv=args.decode_cv,
+        embed_ms=args.embed_ms, completion_tokens=parse_completion_tokens(args.completion_tokens),
+        completion_sigma=args.completion_sigma, seed=args.seed,
+    )
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    sqlite_path = build_seed_database(os.path.join(workdir, "seed.sqlite3"))
+    install_standins(Cassette(args.cassette, synthesize=synthesize_faq_response), sqlite_path, server=server)
+    configure(workdir, warm_caches=False)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        install_sqlite_pool(sqlite_path)
+        from chatbot import custom_sql_agent
+        from states.agent_state import AgentState
+        import utils.tracing
+        from utils.tracing import span
+    from FAQ import sample_queries
+
+    sink = MemorySink()
+    utils.tracing.trace_sink = sink
+    server.drain()
+
+    run_stage = run_threaded_stage if args.mode == "thread" else run_async_stage
+    stages = []
+    for index, concurrency in enumerate(args.concurrency):
+        sink.drain()
+        server.drain()
+        start = time.perf_counter()
+        # The nodes print freely; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            errors = run_stage(custom_sql_agent, AgentState, span, sample_queries, concurrency,
+                               args.stage_seconds, args.think_time, args.seed + 1000 * index)
+        wall_seconds = time.perf_counter() - start
+        stage = summarize_stage(concurrency, wall_seconds, sink.drain(), server.drain(), args.llm_parallel, errors)
+        stages.append(stage)
+        print_stage(stage)
+
+    saturation = find_saturation(stages, args.min_gain, args.node_slowdown)
+    print(f"\nSaturation: {'concurrency ' + str(saturation['concurrency']) if saturation['concurrency'] else 'not reached'}"
+          f" (throughput gain < {args.min_gain:.0%})")
+    for name, concurrency in saturation["nodes"].items():
+        status = f"p99 > {args.node_slowdown}x at concurrency {concurrency}" if concurrency else "no slowdown"
+        print(f"  {name:<28} {status}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "stages": stages, "saturation": saturation}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Offline replay benchmark for the full agent graph (`chatbot.custom_sql_agent`).
+
+Runs every FAQ.py question through the compiled graph with all external
+services replaced by local stand-ins (see benchmarks/standins.py):
+
+    Ollama chat     -> cassette (recorded responses; synthesized from FAQ.py on a miss)
+    Ollama embed    -> deterministic hash embeddings
+    Neo4j           -> schema graph read from the SQLite catalog, other Cypher from the cassette
+    Postgres        -> SQLite database seeded from d.sql
+    Chroma          -> in-memory collection
+
+and reports per-node and end-to-end p50/p95 latency (from the trace spans),
+external call counts per request and allocations per request (tracemalloc).
+
+    python -m benchmarks.replay_benchmark
+    python -m benchmarks.replay_benchmark --iterations 5 --json bench.json
+    python -m benchmarks.replay_benchmark --baseline bench.json --max-regression 0.2
+    python -m benchmarks.replay_benchmark --record      # needs live Ollama (+ Neo4j for fallbacks)
+
+Caches (semantic and result cache) are disabled unless --warm-caches is given,
+so every request walks the full path.
+
+No recorded cassette is committed: unless one was captured with --record
+(needs live Ollama), the default run uses SYNTHETIC LLM answers built from the
+FAQ.py SQL, not recorded model output. The timings then measure the app's own
+overhead around the external calls, not model quality or Ollama latency; the
+summary's "Cassette" line shows how many answers were synthesized.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from benchmarks.standins import (
+    Cassette,
+    build_seed_database,
+    current_question,
+    install_sqlite_pool,
+    install_standins,
+    synthesize_faq_response,
+)
+
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "faq_replay.json")
+EXTERNAL_KINDS = ("llm", "embedding", "vectorstore", "neo4j", "postgres", "kaleido")
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def configure(workdir: str, warm_caches: bool):
+    """Point every on-disk artifact of the app at `workdir` before the graph is imported."""
+    import config
+
+    config.FEW_SHOT_INDEX_DIR = os.path.join(workdir, "few_shot_index")
+    config.SEMANTIC_CACHE_PATH = os.path.join(workdir, "semantic_cache.json")
+    config.TRACE_PATH = os.path.join(workdir, "traces.jsonl")
+    config.TRACE_ENABLED = True
+    config.RESULT_CACHE_WATERMARK_INTERVAL = 0
+    if not warm_caches:
+        config.SEMANTIC_CACHE_THRESHOLD = 1.01   # cosine similarity never exceeds 1
+        config.RESULT_CACHE_MAX_ENTRIES = 0
+    return config
+
+
+def run_question(agent, AgentState, item: dict, span, quiet: bool) -> dict:
+    token = current_question.set(item)
+    output = io.StringIO() if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(output), span("request", kind="request", question=item["question"]):
+            return agent.invoke(AgentState(user_query=item["question"]))
+    except Exception as e:
+        # Recorded as a failed request (error on the request span), the run continues
+        print(f"Request failed: {item['question']!r}: {type(e).__name__}: {e}", file=sys.stderr)
+        return None
+    finally:
+        current_question.reset(token)
+
+
+def read_traces(path: str) -> dict:
+    traces = defaultdict(list)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                traces[record["trace_id"]].append(record)
+    return traces
+
+
+def summarize_traces(traces: dict) -> dict:
+    end_to_end, node_ms, call_counts, failures = [], defaultdict(list), defaultdict(list), 0
+    for spans in traces.values():
+        request = next((s for s in spans if s["kind"] == "request"), None)
+        if request is None:
+            continue
+        end_to_end.append(request["duration_ms"])
+        failures += bool(request["error"])
+        per_node = defaultdict(float)
+        for s in spans:
+            if s["kind"] == "node":
+                # Retries run a node more than once per request; report its total time
+                per_node[s["name"]] += s["duration_ms"]
+        for name, total in per_node.items():
+            node_ms[name].append(total)
+        kinds = Counter(s["kind"] for s in spans)
+        for kind in EXTERNAL_KINDS:
+            call_counts[kind].append(kinds.get(kind, 0))
+
+    return {
+        "requests": len(end_to_end),
+        "failed_requests": failures,
+        "end_to_end_ms": {"p50": percentile(end_to_end, 50), "p95": percentile(end_to_end, 95)},
+        "nodes_ms": {
+            name: {"p50": percentile(values, 50), "p95": percentile(values, 95), "calls": len(values)}
+            for name, values in sorted(node_ms.items())
+        },
+        "calls_per_request": {kind: statistics.mean(values) for kind, values in call_counts.items() if values},
+    }
+
+
+def measure_allocations(agent, AgentState, questions, span, quiet: bool, top: int) -> dict:
+    """Peak and retained traced memory per request, plus the top allocation sites in repo code."""
+    from benchmarks.standins import REPO_ROOT
+
+    peaks, retained = [], []
+    tracemalloc.start(10)
+    before_snapshot = tracemalloc.take_snapshot()
+    for item in questions:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        run_question(agent, AgentState, item, span, quiet)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - start) / 1024)
+        retained.append((current - start) / 1024)
+    after_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Application code only; the stand-ins' own allocations are not ours to optimize
+    repo_filter = [
+        tracemalloc.Filter(True, os.path.join(REPO_ROOT, "*")),
+        tracemalloc.Filter(False, os.path.join(REPO_ROOT, "benchmarks", "*")),
+    ]
+    stats = after_snapshot.filter_traces(repo_filter).compare_to(before_snapshot.filter_traces(repo_filter), "lineno")
+    return {
+        "peak_kib": {"p50": percentile(peaks, 50), "p95": percentile(peaks, 95)},
+        "retained_kib": {"p50": percentile(retained, 50), "p95": percentile(retained, 95)},
+        "top_sites": [
+            {"site": str(stat.traceback[0]), "size_kib": stat.size_diff / 1024, "blocks": stat.count_diff}
+            for stat in stats[:top]
+        ],
+    }
+
+
+def print_report(summary: dict):
+    e2e = summary["end_to_end_ms"]
+    print(f"\nRequests: {summary['requests']} (failed: {summary['failed_requests']})")
+    print(f"End-to-end      p50={e2e['p50']:9.2f} ms  p95={e2e['p95']:9.2f} ms")
+    print("\nPer node (total per request, incl. retries):")
+    for name, stats in summary["nodes_ms"].items():
+        print(f"  {name:<28} p50={stats['p50']:9.2f} ms  p95={stats['p95']:9.2f} ms  requests={stats['calls']}")
+    print("\nExternal calls per request (mean):")
+    for kind, mean in summary["calls_per_request"].items():
+        print(f"  {kind:<12} {mean:6.2f}")
+    if "allocations" in summary:
+        allocations = summary["allocations"]
+        print(f"\nAllocations per request: peak p50={allocations['peak_kib']['p50']:.1f} KiB "
+              f"p95={allocations['peak_kib']['p95']:.1f} KiB, retained p50={allocations['retained_kib']['p50']:.1f} KiB")
+        for site in allocations["top_sites"]:
+            print(f"  {site['size_kib']:10.1f} KiB {site['blocks']:7d} blocks  {site['site']}")
+    print(f"\nCassette: {summary['cassette']}")
+    if summary["cassette"].get("synthesized"):
+        print("  (synthesized answers are derived from FAQ.py, not recorded model output)")
+
+
+def compare_to_baseline(summary: dict, baseline: dict, max_regression: float) -> list:
+    """p95 latencies that grew by more than `max_regression` (fraction) over the baseline."""
+    regressions = []
+    pairs = [("end_to_end", summary["end_to_end_ms"], baseline.get("end_to_end_ms"))]
+    pairs += [(name, stats, baseline.get("nodes_ms", {}).get(name)) for name, stats in summary["nodes_ms"].items()]
+    for name, current, previous in pairs:
+        if previous and previous["p95"] > 0 and current["p95"] > previous["p95"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95']:.2f} -> {current['p95']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE,
+                        help="recorded LLM/Cypher responses; not committed, so by default every answer is "
+                             "synthesized from FAQ.py (see --record)")
+    parser.add_argument("--record", action="store_true", help="call live services on a cassette miss and save")
+    parser.add_argument("--strict", action="store_true", help="fail on a cassette miss instead of synthesizing")
+    parser.add_argument("--iterations", type=int, default=3, help="timed passes over the questions")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed passes first")
+    parser.add_argument("--limit", type=int, default=None, help="only the first N FAQ questions")
+    parser.add_argument("--warm-caches", action="store_true", help="keep semantic/result caches enabled")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--top-allocations", type=int, default=10)
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--baseline", help="summary JSON of an earlier run to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="show the nodes' own output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="replay_bench_")
+    sqlite_path = build_seed_database(os.path.join(workdir, "seed.sqlite3"))
+    cassette = Cassette(args.cassette, mode="record" if args.record else "replay", strict=args.strict,
+                        synthesize=synthesize_faq_response)
+    install_standins(cassette, sqlite_path)
+    configure(workdir, args.warm_caches)
+
+    quiet = not args.verbose
+    with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+        install_sqlite_pool(sqlite_path)
+        from chatbot import custom_sql_agent
+        from states.agent_state import AgentState
+        from utils.tracing import span, trace_sink
+    from FAQ import sample_queries
+
+    questions = sample_queries[:args.limit] if args.limit else sample_queries
+
+    trace_sink.enabled = False
+    for _ in range(args.warmup):
+        for item in questions:
+            run_question(custom_sql_agent, AgentState, item, span, quiet)
+
+    trace_sink.enabled = True
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for item in questions:
+            run_question(custom_sql_agent, AgentState, item, span, quiet)
+    wall_seconds = time.perf_counter() - start
+    trace_sink.enabled = False
+
+    summary = summarize_traces(read_traces(trace_sink.path))
+    summary["wall_seconds"] = wall_seconds
+    if not args.no_allocations:
+        summary["allocations"] = measure_allocations(custom_sql_agent, AgentState, questions, span, quiet, args.top_allocations)
+    summary["cassette"] = dict(cassette.counts)
+    if args.record:
+        cassette.save()
+
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_to_baseline(summary, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions over baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
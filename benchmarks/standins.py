@@ -0,0 +1,498 @@
+"""
+Local stand-ins for the agent's external services, used by the offline benchmarks.
+
+    install_standins(...)   patch ChatOllama / Neo4jGraph / OllamaEmbeddings / Chroma
+                            before `config` is imported
+    install_sqlite_pool()   route utils.db_pool / utils.async_db_pool connections to
+                            a SQLite copy of d.sql
+
+Nothing here is imported by the application itself.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_SQL_PATH = os.path.join(REPO_ROOT, "d.sql")
+
+# FAQ entry ({"question", "answer"}) the benchmark is currently asking; copied
+# into LangGraph worker threads, so synthesized responses match the question
+current_question: ContextVar[Optional[dict]] = ContextVar("current_question", default=None)
+
+_real_classes: Dict[str, Any] = {}
+
+
+def prompt_text(messages) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+
+# ---------------------------------------------------------------------------
+# Cassettes
+# ---------------------------------------------------------------------------
+
+class Cassette:
+    """
+    Recorded LLM responses and Cypher results keyed by graph node + prompt hash.
+
+    In "replay" mode a miss is answered by `synthesize` (or raises with
+    `strict`); in "record" mode misses are forwarded to the live service and
+    stored, then written back with `save()`.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", strict: bool = False, synthesize: Callable = None):
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self.synthesize = synthesize
+        self.entries = {"llm": {}, "cypher": {}}
+        self.counts = {"hits": 0, "synthesized": 0, "recorded": 0}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries.update(json.load(f))
+
+    def _lookup(self, section: str, key: str, live: Callable, fallback: Callable):
+        with self._lock:
+            if key in self.entries[section]:
+                self.counts["hits"] += 1
+                return self.entries[section][key]
+        if self.mode == "record":
+            value = live()
+            with self._lock:
+                self.entries[section][key] = value
+                self.counts["recorded"] += 1
+            return value
+        if self.strict:
+            raise KeyError(f"No cassette entry for {section} {key}")
+        with self._lock:
+            self.counts["synthesized"] += 1
+        return fallback()
+
+    def llm(self, node: str, prompt: str, live: Callable) -> str:
+        return self._lookup("llm", f"{node}:{_digest(prompt)}", live, lambda: self.synthesize(node, prompt))
+
+    def cypher(self, query: str, params: dict, live: Callable) -> list:
+        key = _digest(query + json.dumps(params or {}, sort_keys=True, default=str))
+        return self._lookup("cypher", key, live, lambda: [])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+
+
+def synthesize_faq_response(node: str, prompt: str) -> str:
+    """
+    Plausible response per graph node for the current FAQ question, so a replay
+    without a recorded cassette still walks the full happy path.
+    """
+    from utils.sql_utils import extract_tables
+
+    item = current_question.get() or {"question": "", "answer": "SELECT 1"}
+    # FAQ answers use `?` placeholders; bind them to a literal so the SQL runs
+    sql = item["answer"].replace("?", "1")
+    if node == "analyze_query":
+        tables = ", ".join(extract_tables(sql) or []) or "hierarchy"
+        return (
+            f"Query_Details: {item['question']}\n"
+            f"Action_Details: Summarise the result for the user\n"
+            f"Cypher_Details: Fetch the schema of tables {tables}"
+        )
+    if node == "generate_sql":
+        return f"```sql\n{sql}\n```"
+    if node == "respond":
+        if "CSV Chunk:" in prompt:
+            return "- Chunk findings: values are within the expected range."
+        return "Processed Output: The query returned the requested records; totals and trends are summarised above."
+    return ""
+
+
+# ---------------------------------------------------------------------------
+# LLM
+# ---------------------------------------------------------------------------
+
+class CassetteChatModel(BaseChatModel):
+    """Drop-in for ChatOllama that answers from the active cassette."""
+
+    model: str = "cassette"
+    cassette: Any = None
+    # Optional simulated Ollama server (the load test's latency/queueing model);
+    # `serve(node, prompt_tokens, completion_tokens)` blocks for the simulated time
+    server: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-chat"
+
+    def _live_response(self, messages) -> str:
+        delegate = _real_classes["ChatOllama"](model=self.model)
+        return delegate.invoke(messages).content
+
+    def _respond(self, messages, run_manager):
+        from utils.prompt_budget import count_tokens
+
+        node = ((run_manager.metadata if run_manager else None) or {}).get("langgraph_node", "unknown")
+        prompt = prompt_text(messages)
+        text = self.cassette.llm(node, prompt, lambda: self._live_response(messages))
+        return node, text, count_tokens(prompt), count_tokens(text)
+
+    @staticmethod
+    def _result(text: str, prompt_tokens: int, completion_tokens: int) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(
+            message=AIMessage(content=text),
+            generation_info={"prompt_eval_count": prompt_tokens, "eval_count": completion_tokens},
+        )])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        node, text, prompt_tokens, completion_tokens = self._respond(messages, run_manager)
+        if self.server is not None:
+            completion_tokens = self.server.serve(node, prompt_tokens, completion_tokens)
+        return self._result(text, prompt_tokens, completion_tokens)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        node, text, prompt_tokens, completion_tokens = self._respond(messages, run_manager)
+        if self.server is not None:
+            completion_tokens = await self.server.aserve(node, prompt_tokens, completion_tokens)
+        return self._result(text, prompt_tokens, completion_tokens)
+
+
+# ---------------------------------------------------------------------------
+# Embeddings / vector store
+# ---------------------------------------------------------------------------
+
+class HashEmbeddings(Embeddings):
+    """Deterministic unit vectors derived from the text hash (no Ollama)."""
+
+    def __init__(self, model: str = "hash", dim: int = 768, server: Any = None, **kwargs):
+        self.model = model
+        self.dim = dim
+        self.server = server if server is not None else _standin_options.get("server")
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    @staticmethod
+    def _node() -> str:
+        # Embeddings get no run manager; the graph node is in the inherited runnable config
+        from langchain_core.runnables.config import var_child_runnable_config
+
+        return ((var_child_runnable_config.get() or {}).get("metadata") or {}).get("langgraph_node", "unknown")
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.server is not None:
+            self.server.serve(self._node(), len(text) // 4 + 1, 0, kind="embedding")
+        return self._vector(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.server is not None:
+            await self.server.aserve(self._node(), len(text) // 4 + 1, 0, kind="embedding")
+        return self._vector(text)
+
+
+def _in_memory_chroma(*args, persist_directory=None, **kwargs):
+    # Never touch the repo's ./chromeDB from a benchmark
+    return _real_classes["Chroma"](*args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# SQLite (Postgres and Neo4j stand-ins)
+# ---------------------------------------------------------------------------
+
+def build_seed_database(path: str, seed_sql_path: str = SEED_SQL_PATH) -> str:
+    """Create a SQLite database at `path` from d.sql."""
+    with open(seed_sql_path, "r") as f:
+        script = f.read()
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(script)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+# Postgres-only statements answered with a SQLite equivalent (see install_sqlite_pool)
+_query_rewrites: Dict[str, str] = {}
+
+SQLITE_CATALOG_QUERY = """
+SELECT 'main' AS table_schema, m.name AS table_name, p.name AS column_name
+FROM sqlite_master m JOIN pragma_table_info(m.name) p
+WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+ORDER BY m.name, p.cid
+"""
+
+
+def _execute_sqlite(cursor: sqlite3.Cursor, query: str, params=()):
+    """Run `query` on SQLite, translating the Postgres-only statements the app issues."""
+    from utils.result_cache import AWATERMARK_QUERY, WATERMARK_QUERY
+    from utils.sql_validator import EXPLAIN_PREFIX
+
+    query = _query_rewrites.get(query, query)
+    if query in (WATERMARK_QUERY, AWATERMARK_QUERY):
+        # The seeded database is opened read-only, so its write counters never move
+        tables = list(params[0])
+        placeholders = ", ".join("?" for _ in tables)
+        return cursor.execute(
+            f"SELECT name, 0, 0, 0, 0 FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", tables
+        )
+    if query.startswith("SET LOCAL "):
+        return cursor.execute("SELECT 1")
+    if query.startswith(EXPLAIN_PREFIX):
+        # SQLite has no cost estimates: report the actual row count as both rows and cost
+        sql = query[len(EXPLAIN_PREFIX):].rstrip().rstrip(";")
+        rows = cursor.execute(f"SELECT COUNT(*) FROM (\n{sql}\n)").fetchone()[0]
+        plan = [{"Plan": {"Node Type": "SQLite", "Total Cost": float(rows), "Plan Rows": rows}}]
+        return cursor.execute("SELECT ?", (json.dumps(plan),))
+    return cursor.execute(query, params)
+
+
+class _SQLiteCursor:
+    """The subset of the psycopg2 cursor API used by run_sql_query, the result cache and the SQL validator."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+        self.itersize = 2000
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=None):
+        _execute_sqlite(self._cursor, query, params or ())
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+
+class _SQLiteConnection:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self, name=None):
+        # Named (server-side) cursors have no SQLite equivalent; fetchmany batching still applies
+        return _SQLiteCursor(self._conn.cursor())
+
+
+class SQLitePool:
+    """Stands in for utils.db_pool.ConnectionPool, one read-only SQLite connection per checkout."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {"checkouts": 0, "in_use": 0}
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+        try:
+            yield _SQLiteConnection(conn)
+        finally:
+            conn.close()
+            with self._lock:
+                self._stats["in_use"] -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+class _AsyncSQLiteCursor:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    async def fetch(self, size):
+        return await asyncio.to_thread(self._cursor.fetchmany, size)
+
+
+class _AsyncSQLiteStatement:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def get_attributes(self):
+        return [SimpleNamespace(name=column[0]) for column in self._cursor.description]
+
+    async def cursor(self):
+        return _AsyncSQLiteCursor(self._cursor)
+
+
+class _AsyncSQLiteConnection:
+    """The subset of the asyncpg connection API used by arun_sql_query, the result cache and the SQL validator."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    @asynccontextmanager
+    async def transaction(self, readonly=False):
+        yield
+
+    async def prepare(self, query):
+        return _AsyncSQLiteStatement(await asyncio.to_thread(self._conn.execute, query))
+
+    async def fetch(self, query, *args):
+        return await asyncio.to_thread(lambda: _execute_sqlite(self._conn.cursor(), query, args).fetchall())
+
+    async def fetchval(self, query):
+        return (await asyncio.to_thread(lambda: _execute_sqlite(self._conn.cursor(), query).fetchone()))[0]
+
+    async def execute(self, query):
+        await asyncio.to_thread(_execute_sqlite, self._conn.cursor(), query)
+
+
+class AsyncSQLitePool(SQLitePool):
+    """Stands in for utils.async_db_pool.AsyncConnectionPool."""
+
+    @asynccontextmanager
+    async def connection(self):
+        with super().connection() as conn:
+            yield _AsyncSQLiteConnection(conn._conn)
+
+
+class LocalNeo4jGraph:
+    """
+    Neo4jGraph stand-in: the schema snapshot queries are answered from the
+    seeded SQLite catalog (tables, columns, foreign keys); any other Cypher
+    goes through the cassette.
+    """
+
+    schema = ""
+    structured_schema: dict = {}
+
+    def __init__(self, *args, sqlite_path: str = None, cassette: Cassette = None, **kwargs):
+        self.sqlite_path = sqlite_path or _standin_options["sqlite_path"]
+        self.cassette = cassette or _standin_options["cassette"]
+        self._live_args = (args, kwargs)
+
+    def get_structured_schema(self) -> dict:
+        return self.structured_schema
+
+    def refresh_schema(self):
+        pass
+
+    def _catalog(self):
+        conn = sqlite3.connect(self.sqlite_path)
+        try:
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )]
+            columns = {table: conn.execute(f"PRAGMA table_info('{table}')").fetchall() for table in tables}
+            foreign_keys = {table: conn.execute(f"PRAGMA foreign_key_list('{table}')").fetchall() for table in tables}
+        finally:
+            conn.close()
+        return tables, columns, foreign_keys
+
+    def query(self, query: str, params: dict = None) -> list:
+        tables, columns, foreign_keys = self._catalog()
+        if re.search(r"MATCH \(t:Table\)", query) and "CONTAINS" in query:
+            return [
+                {
+                    "table_name": table,
+                    "table_properties": {"name": table},
+                    "fields": [
+                        {
+                            "name": name,
+                            "data_type": data_type or "TEXT",
+                            "required": bool(not_null or primary_key),
+                            **({"default": default} if default is not None else {}),
+                        }
+                        for _, name, data_type, not_null, default, primary_key in columns[table]
+                    ],
+                }
+                for table in tables
+            ]
+        if "REFERENCES|RECEIVES" in query:
+            return [
+                {"source": table, "type": "REFERENCES", "target": fk[2]}
+                for table in tables for fk in foreign_keys[table]
+            ]
+
+        def live():
+            args, kwargs = self._live_args
+            return _real_classes["Neo4jGraph"](*args, **kwargs).query(query, params or {})
+
+        return self.cassette.cypher(query, params, live)
+
+
+# ---------------------------------------------------------------------------
+# Installation
+# ---------------------------------------------------------------------------
+
+_standin_options: Dict[str, Any] = {}
+
+
+def install_standins(cassette: Cassette, sqlite_path: str, server: Any = None):
+    """
+    Replace the service clients `config.py` constructs. Must run before the
+    first `import config`. `server` (optional) simulates Ollama latency and
+    queueing for both chat and embedding calls.
+    """
+    import langchain_chroma
+    import langchain_community.chat_models
+    import langchain_community.graphs
+    import langchain_ollama
+
+    _real_classes.setdefault("ChatOllama", langchain_community.chat_models.ChatOllama)
+    _real_classes.setdefault("Neo4jGraph", langchain_community.graphs.Neo4jGraph)
+    _real_classes.setdefault("OllamaEmbeddings", langchain_ollama.OllamaEmbeddings)
+    _real_classes.setdefault("Chroma", langchain_chroma.Chroma)
+    _standin_options.update(cassette=cassette, sqlite_path=sqlite_path, server=server)
+
+    def chat_model(*args, **kwargs):
+        return CassetteChatModel(model=kwargs.get("model", "cassette"), cassette=cassette, server=server)
+
+    langchain_community.chat_models.ChatOllama = chat_model
+    langchain_community.graphs.Neo4jGraph = LocalNeo4jGraph
+    langchain_ollama.OllamaEmbeddings = HashEmbeddings
+    langchain_chroma.Chroma = _in_memory_chroma
+
+
+def install_sqlite_pool(sqlite_path: str) -> SQLitePool:
+    """
+    Make utils.db_pool (sync graph path) and utils.async_db_pool (async path)
+    hand out SQLite connections. Must run before the nodes are imported.
+    """
+    import utils.async_db_pool
+    import utils.db_pool
+    from utils.sql_validator import CATALOG_QUERY
+
+    _query_rewrites[CATALOG_QUERY] = SQLITE_CATALOG_QUERY
+    utils.db_pool._pool = SQLitePool(sqlite_path)
+    utils.async_db_pool.async_pool = AsyncSQLitePool(sqlite_path)
+    return utils.db_pool._pool
@@ -19,49 +19,117 @@ import json
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.schema import AIMessage, HumanMessage
 from states.agent_state import AgentState
-from config import llm
-from nodes.generate_sql_query import generate_sql_node
-from nodes.run_query import run_query_and_handle_error_node
-from nodes.respond_to_user import respond_to_user
-from nodes.analyze_query import analyze_query_node
-from nodes.analyze_schema import analyze_schema_node
+from config import llm, SQL_REPAIR_ATTEMPTS, SQL_MAX_ATTEMPTS
+from nodes.generate_sql_query import generate_sql_node, agenerate_sql_node
+from nodes.validate_sql import validate_sql_node, avalidate_sql_node
+from nodes.run_query import run_query_and_handle_error_node, arun_query_and_handle_error_node
+from nodes.respond_to_user import respond_to_user, arespond_to_user
+from nodes.analyze_query import analyze_query_node, aanalyze_query_node
+from nodes.analyze_schema import analyze_schema_node, aanalyze_schema_node
+from nodes.check_cache import check_semantic_cache_node, acheck_semantic_cache_node
+from nodes.retrieve_examples import retrieve_examples_node, aretrieve_examples_node
+from utils.tracing import span, traced_node, tracing_callback
 
 #  Use `add_conditional_edges()` Instead of `condition
-def check_success(state: AgentState) -> str:
-    """Validates the SQL query using sql_db_query_checker before execution."""
-    if not state.query_result:
-        print(f"Error Encountered: {state.error}")
-        if state.loop_count >= 5:
-            return "respond"  # Stop execution once limit is reached
-        return "analyze_query"
-    else:  
-        return "respond"
+def check_success(state: AgentState):
+    """Route a failed execution to a SQL-only repair, or to a full re-analysis once repairs keep failing."""
+    if state.query_result is not None:
+        return "respond"  # An empty result is an answer too ("No results found")
+    if state.clarification:
+        return "respond"  # Cost guard: ask the user to narrow the question
+
+    print(f"Error Encountered: {state.error}")
+    if state.loop_count >= SQL_MAX_ATTEMPTS:
+        return "respond"  # Stop execution once limit is reached
+    if state.schema_info and state.loop_count % (SQL_REPAIR_ATTEMPTS + 1):
+        # One LLM call: schema_info, db_query and the examples are reused as they are
+        return "generate_sql"
+    # Re-enter both branches so the join before generate_sql fires again
+    return ["analyze_query", "retrieve_examples"]
+
+
+def route_after_validation(state: AgentState):
+    """Execute SQL that passed validation; rejected SQL takes the same retry path as a failed execution."""
+    if state.error or state.clarification:
+        return check_success(state)
+    return "run_query_and_handle_error"
+
+
+def route_after_cache(state: AgentState):
+    """Skip query/schema analysis and SQL generation on a semantic cache hit."""
+    if state.cache_hit:
+        # Re-checked like generated SQL: the entry may predate validation or a SQL_GUARD_* change
+        return "validate_sql"
+    # Few-shot retrieval only needs user_query, so it runs alongside the analysis branch
+    return ["analyze_query", "retrieve_examples"]
     
 
 # Build Graph
+# Every node has a sync and an async implementation: `.invoke`/`.stream` run the
+# sync ones, `.ainvoke`/`.astream` the async ones, so one worker can interleave
+# many in-flight questions while they wait on Ollama.
 graph = StateGraph(AgentState)
-graph.add_node("analyze_query", analyze_query_node)
-graph.add_node("analyze_schema", analyze_schema_node)
-graph.add_node("generate_sql", generate_sql_node)
-graph.add_node("run_query_and_handle_error", run_query_and_handle_error_node)
-graph.add_node("respond", respond_to_user)
 
 
+def add_traced_node(name, func, afunc):
+    # Each node call becomes a span (duration, retry iteration, row count) in the trace sink
+    graph.add_node(name, RunnableLambda(traced_node(name, func), afunc=traced_node(name, afunc)))
+
 
-graph.add_edge(START, "analyze_query")
+add_traced_node("check_cache", check_semantic_cache_node, acheck_semantic_cache_node)
+add_traced_node("analyze_query", analyze_query_node, aanalyze_query_node)
+add_traced_node("analyze_schema", analyze_schema_node, aanalyze_schema_node)
+add_traced_node("retrieve_examples", retrieve_examples_node, aretrieve_examples_node)
+add_traced_node("generate_sql", generate_sql_node, agenerate_sql_node)
+add_traced_node("validate_sql", validate_sql_node, avalidate_sql_node)
+add_traced_node("run_query_and_handle_error", run_query_and_handle_error_node, arun_query_and_handle_error_node)
+add_traced_node("respond", respond_to_user, arespond_to_user)
+
+
+graph.add_edge(START, "check_cache")
+graph.add_conditional_edges(
+    "check_cache",
+    route_after_cache,
+    {
+        "analyze_query": "analyze_query",
+        "retrieve_examples": "retrieve_examples",
+        "validate_sql": "validate_sql"
+    }
+)
 graph.add_edge("analyze_query","analyze_schema")
-graph.add_edge("analyze_schema","generate_sql")
-graph.add_edge("generate_sql", "run_query_and_handle_error")
+# Join: SQL generation waits for both the schema analysis and the retrieval branch
+graph.add_edge(["analyze_schema", "retrieve_examples"], "generate_sql")
+graph.add_edge("generate_sql", "validate_sql")
+graph.add_conditional_edges(
+    "validate_sql",
+    route_after_validation,
+    {
+        "run_query_and_handle_error": "run_query_and_handle_error",
+        "analyze_query": "analyze_query",
+        "retrieve_examples": "retrieve_examples",
+        "generate_sql": "generate_sql",
+        "respond": "respond"
+    }
+)
 graph.add_conditional_edges(
     "run_query_and_handle_error",
     check_success,
     {
         "analyze_query": "analyze_query",
+        "retrieve_examples": "retrieve_examples",
+        "generate_sql": "generate_sql",
         "respond": "respond"
     }
 )
 
 graph.add_edge("respond", END)
 
-# Compile Graph
-custom_sql_agent = graph.compile()
+# Compile Graph; the callback turns every LLM call inside a node into an `llm` span
+custom_sql_agent = graph.compile().with_config(callbacks=[tracing_callback])
+
+
+async def astream_agent(user_query: str, stream_mode="updates"):
+    """Drive the agent asynchronously: `async for step in astream_agent(question): ...`."""
+    with span("request", kind="request", user_query=user_query):
+        async for step in custom_sql_agent.astream(AgentState(user_query=user_query), stream_mode=stream_mode):
+            yield step
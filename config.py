@@ -21,4 +21,94 @@ vectorstores = Chroma(
     collection_name="business_data_vector_store",
     embedding_function=ollama_embeddings,
     persist_directory="./chromeDB"
-)
\ No newline at end of file
+)
+
+# Postgres connection pool
+POSTGRES_CONFIG = {
+    "database": "fintrack",
+    "user": "postgres",
+    "password": "App4ever#",
+    "host": "localhost",
+    "port": "5432",
+}
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+DB_POOL_TIMEOUT = 30                  # seconds to wait for a free connection
+DB_STATEMENT_TIMEOUT_MS = 30000       # per-connection statement_timeout
+
+# Query result streaming
+QUERY_FETCH_BATCH_SIZE = 500          # rows per fetchmany() round trip
+QUERY_MAX_ROWS = 1000                 # hard cap on rows kept per query
+
+# Semantic query cache (question embedding -> validated SQL); entries are saved
+# as JSON at SEMANTIC_CACHE_PATH, their vectors next to it as .npy
+SEMANTIC_CACHE_PATH = "./.semantic_cache.json"
+SEMANTIC_CACHE_THRESHOLD = 0.92       # minimum cosine similarity for a hit
+SEMANTIC_CACHE_TTL = 7 * 24 * 3600    # seconds before an entry expires
+SEMANTIC_CACHE_MAX_ENTRIES = 500      # least recently used entries are evicted beyond this
+SEMANTIC_CACHE_SAVE_DELAY = 2.0       # seconds changes are batched before a background save
+
+# Exact SQL result cache
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_MAX_ROWS = 200000        # total rows held across all cached results
+RESULT_CACHE_WATERMARK_INTERVAL = 5   # seconds between pg_stat_user_tables watermark checks
+RESULT_CACHE_TTL = 60                 # expiry for results on tables without statistics (views, ...)
+RESULT_CACHE_MAX_AGE = 600            # expiry for every entry, whatever its watermarks say
+
+# Failed-query retries: a focused SQL-only repair first, a full re-analysis after
+# every SQL_REPAIR_ATTEMPTS failed repairs, and an answer after SQL_MAX_ATTEMPTS failures
+SQL_REPAIR_ATTEMPTS = 2
+SQL_MAX_ATTEMPTS = 5
+
+# Pre-execution SQL validation (sqlglot parse, information_schema catalog, EXPLAIN)
+SQL_CATALOG_REFRESH_INTERVAL = 600    # seconds between information_schema reloads
+SQL_VALIDATE_EXPLAIN = True           # plan (without running) queries that pass the local checks
+
+# Cost guard on the EXPLAIN (FORMAT JSON) estimate of generated SQL (needs SQL_VALIDATE_EXPLAIN)
+SQL_GUARD_MAX_COST = 1000000          # planner cost units; above this SQL_GUARD_OVER_COST applies
+SQL_GUARD_OVER_COST = "clarify"       # "clarify" (ask the user to narrow the question) or "reject" (repair the SQL)
+SQL_GUARD_LIMIT_ROWS = QUERY_MAX_ROWS # estimated rows above this get LIMIT QUERY_MAX_ROWS + 1 if unbounded
+SQL_QUERY_TIMEOUT_MS = 15000          # SET LOCAL statement_timeout for each generated query
+
+# In-memory schema graph snapshot
+SCHEMA_REFRESH_INTERVAL = 3600        # seconds between schema-hash checks against Neo4j
+
+# Few-shot example retrieval ("numpy" = memory-mapped index, "chroma" = vectorstores above)
+FEW_SHOT_RETRIEVER = "numpy"
+FEW_SHOT_INDEX_DIR = "./few_shot_index"
+
+# Embedding of FAQ/Chroma documents in vector_db.py (batched, cached on disk by content hash)
+EMBEDDING_CACHE_PATH = "./.embedding_cache.sqlite3"
+EMBEDDING_BATCH_SIZE = 32             # texts per embed_documents request to Ollama
+EMBEDDING_MAX_WORKERS = 4             # batch requests in flight
+
+# Prompt token budgets per section (tiktoken cl100k_base counts)
+PROMPT_TOKEN_ENCODING = "cl100k_base"
+PROMPT_BUDGETS = {
+    "schema": 2500,       # formatted schema_info, primary tables kept first
+    "few_shots": 1200,    # retrieved question/SQL examples, most relevant first
+    "error": 300,         # previous database error fed back to the LLM
+    "data": 3000,         # query result rows sent for summarisation
+}
+
+# Deterministic analytics pre-pass before summarisation
+ANALYTICS_SAMPLE_ROWS = 20            # raw rows sent to the LLM next to the computed summary
+ANALYTICS_TOP_K = 5
+ANALYTICS_Z_THRESHOLD = 2.0
+
+# Map-reduce summarisation for large results
+MAP_REDUCE_ROW_THRESHOLD = 200        # results with more rows are summarised chunk by chunk
+MAP_REDUCE_CHUNK_TOKENS = 2000        # CSV tokens per map chunk
+MAP_REDUCE_MAX_CONCURRENCY = 4        # map-step LLM calls in flight against Ollama
+
+# PDF report
+REPORT_MAX_TABLE_ROWS = 5000          # rows rendered into the report table
+REPORT_TABLE_FONT_SIZE = 8
+REPORT_WORKERS = 2                    # background threads building PDF reports
+REPORT_CACHE_MAX_ENTRIES = 50         # finished reports kept in memory
+REPORT_PREFETCH = True                # start building the PDF as soon as the answer is shown
+REPORT_TIMEOUT_SECONDS = 120          # longest the page waits for a report before offering a retry
+
+# Per-request tracing (one JSON object per span)
+TRACE_ENABLED = True
+TRACE_PATH = "./traces.jsonl"
@@ -6,12 +6,9 @@ import re
 from prompt_templates import get_analyze_query_prompt
 from states.agent_state import AgentState
 from config import llm
+from utils.prompt_budget import log_prompt_tokens
 
-def analyze_query_node(state: AgentState):
-    prompt_template = get_analyze_query_prompt(state)
-    response = llm.invoke(prompt_template.format(input=state.user_query))
-    response_text = response.content.strip()
-
+def parse_analysis(state: AgentState, response_text: str):
     query_match = re.search(r"Query_Details:\s*(.+?)(?=\n[A-Za-z_]*Details:|$)", response_text, re.DOTALL | re.IGNORECASE)
     action_match = re.search(r"Action_Details:\s*(.+?)(?=\n[A-Za-z_]*Details:|$)", response_text, re.DOTALL | re.IGNORECASE)
     cypher_match = re.search(r"Cypher_Details:\s*(.+?)(?=\n[A-Za-z_]*Details:|$)", response_text, re.DOTALL | re.IGNORECASE)
@@ -25,7 +22,22 @@ def analyze_query_node(state: AgentState):
         cypher_details = cypher_details,
         db_query=query_details,
         general_query=action_details,
+        schema_info=state.schema_info,
         sql_query=None,
         error=None,
         loop_count=state.loop_count
-    )
\ No newline at end of file
+    )
+
+def analyze_query_node(state: AgentState):
+    prompt_template = get_analyze_query_prompt(state)
+    prompt = prompt_template.format(input=state.user_query)
+    log_prompt_tokens("analyze_query", prompt)
+    response = llm.invoke(prompt)
+    return parse_analysis(state, response.content.strip())
+
+async def aanalyze_query_node(state: AgentState):
+    prompt_template = get_analyze_query_prompt(state)
+    prompt = prompt_template.format(input=state.user_query)
+    log_prompt_tokens("analyze_query", prompt)
+    response = await llm.ainvoke(prompt)
+    return parse_analysis(state, response.content.strip())
@@ -1,52 +1,83 @@
+import asyncio
 from langchain_neo4j import GraphCypherQAChain
 from prompt_templates import get_analyze_query_prompt, get_cypher_generation_prompt, get_qa_prompt
 from states.agent_state import AgentState
 from config import llm, graph
 from utils.format_final_response import format_schema_to_string
+from utils.schema_snapshot import schema_snapshot
+from utils.tracing import span
 
-def analyze_schema_node(state: AgentState):
-    cypher_prompt = get_cypher_generation_prompt()
-    qa_prompt = get_qa_prompt()
-    graph_rag_chain = GraphCypherQAChain.from_llm(
-        cypher_llm=llm,
-        qa_llm=llm,
-        validate_cypher=True,
-        graph=graph,
-        verbose=True,
-        return_intermediate_steps=True,
-        return_direct = True,
-        cypher_prompt=cypher_prompt,
-        qa_prompt = qa_prompt,
-        allow_dangerous_requests=True
+_graph_rag_chain = None
+
+def get_graph_rag_chain():
+    """Build the Cypher QA chain once; only used when the local snapshot cannot resolve the tables."""
+    global _graph_rag_chain
+    if _graph_rag_chain is None:
+        cypher_prompt = get_cypher_generation_prompt()
+        qa_prompt = get_qa_prompt()
+        _graph_rag_chain = GraphCypherQAChain.from_llm(
+            cypher_llm=llm,
+            qa_llm=llm,
+            validate_cypher=True,
+            graph=graph,
+            verbose=True,
+            return_intermediate_steps=True,
+            return_direct = True,
+            cypher_prompt=cypher_prompt,
+            qa_prompt = qa_prompt,
+            allow_dangerous_requests=True
+        )
+    return _graph_rag_chain
+
+def schema_found(state: AgentState, result_str: str):
+    # result_str = llm.invoke(qa_prompt.format(context=schema_info['result']))
+    print(result_str)
+    return AgentState(
+        user_query=state.user_query,
+        db_query=state.db_query,
+        general_query=state.general_query,
+        schema_info=result_str,
+        sql_query=None,
+        error=None,
+        loop_count=state.loop_count
     )
-    
-    
+
+def schema_failed(state: AgentState, e: Exception):
+    # Optionally include more detailed logs or traceback
+    error_msg = f"Cypher query generation failed: {str(e)}"
+    print(error_msg)  # Log detailed traceback
+    return AgentState(
+        user_query=state.user_query,
+        db_query=state.db_query,
+        general_query=state.general_query,
+        schema_info = state.db_query,
+        sql_query=None,
+        error=None,
+        loop_count=state.loop_count
+    )
+
+def analyze_schema_node(state: AgentState):
     try:
-        schema_info = graph_rag_chain.invoke({"query": state.cypher_details})
-        result_str = format_schema_to_string(schema_info['result'])
-        # result_str = llm.invoke(qa_prompt.format(context=schema_info['result']))
-        print(result_str)
-        return AgentState(
-            user_query=state.user_query,
-            db_query=state.db_query,
-            general_query=state.general_query,
-            schema_info=result_str,
-            sql_query=None,
-            error=None,
-            loop_count=state.loop_count
-        )
-    
+        # Resolve tables and FK neighbours from the in-memory schema snapshot
+        result_str = schema_snapshot.schema_string(state.cypher_details)
+        if result_str is None:
+            print("Schema snapshot found no matching tables, falling back to GraphCypherQAChain")
+            with span("neo4j.graph_rag", kind="neo4j"):
+                schema_info = get_graph_rag_chain().invoke({"query": state.cypher_details})
+            result_str = format_schema_to_string(schema_info['result'])
+        return schema_found(state, result_str)
     except Exception as e:
-        # Optionally include more detailed logs or traceback
-        error_msg = f"Cypher query generation failed: {str(e)}"
-        print(error_msg)  # Log detailed traceback
-        return AgentState(
-            user_query=state.user_query,
-            db_query=state.db_query,
-            general_query=state.general_query,
-            schema_info = state.db_query,
-            sql_query=None,
-            error=None,
-            loop_count=state.loop_count
-        )
-    
\ No newline at end of file
+        return schema_failed(state, e)
+
+async def aanalyze_schema_node(state: AgentState):
+    try:
+        # A periodic snapshot refresh talks to Neo4j synchronously, keep it off the event loop
+        result_str = await asyncio.to_thread(schema_snapshot.schema_string, state.cypher_details)
+        if result_str is None:
+            print("Schema snapshot found no matching tables, falling back to GraphCypherQAChain")
+            with span("neo4j.graph_rag", kind="neo4j"):
+                schema_info = await get_graph_rag_chain().ainvoke({"query": state.cypher_details})
+            result_str = format_schema_to_string(schema_info['result'])
+        return schema_found(state, result_str)
+    except Exception as e:
+        return schema_failed(state, e)
@@ -0,0 +1,41 @@
+from states.agent_state import AgentState
+from config import ollama_embeddings
+from utils.semantic_cache import semantic_cache
+from utils.tracing import current_span, span
+
+def cache_lookup(state: AgentState, embedding):
+    entry = semantic_cache.lookup(embedding)
+    node_span = current_span()
+    if node_span is not None:
+        node_span.set(**{f"semantic_cache_{name}": value for name, value in semantic_cache.metrics().items()})
+
+    if entry is None:
+        return AgentState(
+            user_query=state.user_query,
+            query_embedding=embedding,
+            cache_hit=False,
+            loop_count=state.loop_count
+        )
+
+    print(f"Semantic cache hit ({entry['similarity']:.3f}): {entry['user_query']}")
+    return AgentState(
+        user_query=state.user_query,
+        query_embedding=embedding,
+        cache_hit=True,
+        cached_user_query=entry["user_query"],
+        db_query=entry["db_query"],
+        general_query=entry["general_query"],
+        sql_query=entry["sql_query"],
+        loop_count=state.loop_count
+    )
+
+def check_semantic_cache_node(state: AgentState):
+    """Embed the question and reuse validated SQL from a semantically similar earlier question."""
+    with span("ollama.embed", kind="embedding"):
+        embedding = ollama_embeddings.embed_query(state.user_query)
+    return cache_lookup(state, embedding)
+
+async def acheck_semantic_cache_node(state: AgentState):
+    with span("ollama.embed", kind="embedding"):
+        embedding = await ollama_embeddings.aembed_query(state.user_query)
+    return cache_lookup(state, embedding)
@@ -1,44 +1,91 @@
 from states.agent_state import AgentState
-from config import llm, vectorstores
+from config import llm
 import re
 from utils.schema_utils import fetch_table_names, format_schema_info, format_relations_info
-from prompt_templates import get_sql_generation_prompt
+from prompt_templates import get_sql_generation_prompt, get_sql_repair_prompt
 from utils.schema_utils import prepare_schema_data
-from FAQ import sample_queries
+from utils.prompt_budget import fit_items, fit_schema, budget_for, log_prompt_tokens, truncate_to_tokens
+from utils.tracing import current_span
 
 
-def generate_sql_node(state: AgentState):
-    chroma_results = vectorstores.max_marginal_relevance_search(state.user_query,  k=10, fetch_k=20)  # Returns (Document, distance)
-    # # Extract only user query texts from ChromaDB results
-    retrieved_queries = [doc.page_content for doc in chroma_results]
-
-    # Dictionary for quick lookup of SQL queries
-    query_mapping = {item["question"]: item["answer"] for item in sample_queries}
-
-    # Find matching SQL queries
-    matched_sql_queries = [
-        f" User Query: {user_query}\n   → SQL: {query_mapping.get(user_query, 'No SQL Query Found')}"
-        for user_query in retrieved_queries
-    ]
+def build_sql_prompt(state: AgentState):
+    # Few-shot examples were retrieved in parallel by the retrieve_examples node;
+    # keep the most relevant ones that fit the few-shot token budget
+    matched_sql_queries = fit_items(
+        [
+            f" User Query: {example['question']}\n   → SQL: {example['sql']}"
+            for example in state.few_shot_examples or []
+        ],
+        budget_for("few_shots")
+    )
 
     # Format for prompt
     chroma_text = "\n".join(matched_sql_queries)
 
+    if is_repair(state):
+        return build_repair_prompt(state, chroma_text)
+
     """Use LLM to generate an SQL query based on user input."""
     prompt_template = get_sql_generation_prompt()
      
     prompt = prompt_template.invoke({
         "chroma_results":chroma_text,
-        "schema_info":state.schema_info,
+        "schema_info":fit_schema(state.schema_info, budget_for("schema")),
         "db_query":state.db_query,
         "input": state.user_query,
     })
+    log_prompt_tokens("generate_sql", prompt)
+    return prompt
 
-    sql_query = llm.invoke(prompt).content.strip()
+
+def is_repair(state: AgentState) -> bool:
+    # check_success routes a failed execution straight back here with its SQL and error
+    return bool(state.error and state.sql_query)
+
+
+def build_repair_prompt(state: AgentState, chroma_text: str):
+    """Focused retry: the failed SQL and the database error, against the schema already analysed."""
+    node_span = current_span()
+    if node_span is not None:
+        node_span.set(repair=True)
+
+    prompt = get_sql_repair_prompt().invoke({
+        "chroma_results": chroma_text,
+        "schema_info": fit_schema(state.schema_info, budget_for("schema")),
+        "db_query": state.db_query,
+        "failed_sql": state.sql_query,
+        "error": truncate_to_tokens(state.error, budget_for("error")),
+        "input": state.user_query,
+    })
+    log_prompt_tokens("repair_sql", prompt)
+    return prompt
+
+
+def extract_sql(state: AgentState, sql_query: str):
     print("-------------------------------")
     print(sql_query)
     print('-------------------------------')
     match = re.search(r"```sql\s*\n?(.*?)\n?```", sql_query, re.DOTALL | re.IGNORECASE)
-    if match:
-        return AgentState(user_query=state.user_query,db_query = state.db_query, general_query=state.general_query, sql_query=match.group(1).strip(),loop_count= state.loop_count)  # Extract and clean query
-    return AgentState(user_query=state.user_query,db_query = state.db_query, general_query=state.general_query, sql_query=None,loop_count= state.loop_count)
+    # schema_info and the examples stay in the state for a later repair of this SQL
+    return AgentState(
+        user_query=state.user_query,
+        db_query=state.db_query,
+        general_query=state.general_query,
+        schema_info=state.schema_info,
+        few_shot_examples=state.few_shot_examples,
+        sql_query=match.group(1).strip() if match else None,  # Extract and clean query
+        error=None,
+        loop_count=state.loop_count
+    )
+
+
+def generate_sql_node(state: AgentState):
+    prompt = build_sql_prompt(state)
+    sql_query = llm.invoke(prompt).content.strip()
+    return extract_sql(state, sql_query)
+
+
+async def agenerate_sql_node(state: AgentState):
+    prompt = build_sql_prompt(state)
+    sql_query = (await llm.ainvoke(prompt)).content.strip()
+    return extract_sql(state, sql_query)
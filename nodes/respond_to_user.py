@@ -1,32 +1,55 @@
-from utils.format_final_response import apply_general_processing_with_llm
+from utils.format_final_response import apply_general_processing_with_llm, aapply_general_processing_with_llm
 from utils.generate_report_url import generate_report_url
 from states.agent_state import AgentState
 from langchain_core.messages import AIMessage
 from config import llm
-from utils.render_table import render_query_result_table
-from utils.generate_report import generate_pdf_report
 
-def respond_to_user(state: AgentState):
+def check_response_preconditions(state: AgentState):
+    if state.clarification:
+        return AgentState(
+            user_query=state.user_query,
+            final_response=AIMessage(content=state.clarification)
+        )
+
     if state.error:
         return AgentState(
             user_query=state.user_query,
-            final_response=[AIMessage(content=f"Could not execute query. Error: {state.error}")]
+            final_response=AIMessage(content=f"Could not execute query. Error: {state.error}")
         )
 
     if not state.query_result:
         return AgentState(
             user_query=state.user_query,
-            final_response=[AIMessage(content="No results found in the database.")]
+            final_response=AIMessage(content="No results found in the database.")
         )
+    return None
 
-    fig =  render_query_result_table(state.query_result)
-    processed_result = apply_general_processing_with_llm(state)
-    pdf_bytes = generate_pdf_report(state.user_query, processed_result, fig)
+def build_response(state: AgentState, processed_result: str):
     # processed_link = generate_report_url(state, llm)
+    if state.truncated:
+        processed_result += f"\n\n_Result truncated to the first {len(state.query_result)} rows._"
 
     return AgentState(
         user_query=state.user_query,
         # final_response=AIMessage(content=f"Query executed successfully \n\n*Processed Results:* {processed_result}\n\n*Link to Report:* {processed_link}")
         final_response=AIMessage(content=f"Query executed successfully \n\n*Processed Results:* {processed_result}"),
-        pdf_bytes =pdf_bytes
+        query_result=state.query_result,
+        # The PDF report is built on demand from these by utils.report_worker
+        processed_result=processed_result
     )
+
+def respond_to_user(state: AgentState):
+    early_response = check_response_preconditions(state)
+    if early_response is not None:
+        return early_response
+
+    processed_result = apply_general_processing_with_llm(state)
+    return build_response(state, processed_result)
+
+async def arespond_to_user(state: AgentState):
+    early_response = check_response_preconditions(state)
+    if early_response is not None:
+        return early_response
+
+    processed_result = await aapply_general_processing_with_llm(state)
+    return build_response(state, processed_result)
@@ -0,0 +1,49 @@
+from states.agent_state import AgentState
+from config import vectorstores, ollama_embeddings, FEW_SHOT_RETRIEVER, FEW_SHOT_INDEX_DIR
+from utils.few_shot_index import NumpyFewShotIndex
+from utils.few_shot_store import load_few_shot_documents, example_from_document, sync_chroma_examples
+from utils.tracing import span
+
+# Built once at startup from FAQ.py; every entry carries its SQL, parameters and
+# tables, so retrieval needs no question-text join against FAQ.py per request
+few_shot_documents = load_few_shot_documents()
+if FEW_SHOT_RETRIEVER == "numpy":
+    few_shot_retriever = NumpyFewShotIndex.load_or_build(few_shot_documents, ollama_embeddings, FEW_SHOT_INDEX_DIR)
+else:
+    sync_chroma_examples(vectorstores, few_shot_documents)
+    few_shot_retriever = vectorstores
+
+
+def retrieve_examples_node(state: AgentState):
+    """
+    Fetch few-shot question/SQL examples for the user query.
+
+    Runs in parallel with analyze_query/analyze_schema, so it returns only the
+    `few_shot_examples` key to avoid clashing with the other branch's updates.
+    """
+    if state.few_shot_examples is not None:
+        # Retry iteration: the examples depend only on user_query, keep them
+        return {}
+
+    with span(f"{FEW_SHOT_RETRIEVER}.mmr_search", kind="vectorstore", k=10, fetch_k=20,
+              reused_embedding=state.query_embedding is not None):
+        if state.query_embedding is not None:
+            # check_cache already embedded the question with the same model
+            results = few_shot_retriever.max_marginal_relevance_search_by_vector(state.query_embedding, k=10, fetch_k=20)
+        else:
+            # Includes embedding the question with Ollama
+            results = few_shot_retriever.max_marginal_relevance_search(state.user_query, k=10, fetch_k=20)
+    return {"few_shot_examples": [example_from_document(doc) for doc in results]}
+
+
+async def aretrieve_examples_node(state: AgentState):
+    if state.few_shot_examples is not None:
+        return {}
+
+    with span(f"{FEW_SHOT_RETRIEVER}.mmr_search", kind="vectorstore", k=10, fetch_k=20,
+              reused_embedding=state.query_embedding is not None):
+        if state.query_embedding is not None:
+            results = await few_shot_retriever.amax_marginal_relevance_search_by_vector(state.query_embedding, k=10, fetch_k=20)
+        else:
+            results = await few_shot_retriever.amax_marginal_relevance_search(state.user_query, k=10, fetch_k=20)
+    return {"few_shot_examples": [example_from_document(doc) for doc in results]}
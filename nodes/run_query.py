@@ -1,23 +1,68 @@
-from utils.run_sql_query import run_sql_query
+from utils.result_cache import cached_run_sql_query, acached_run_sql_query, result_cache
+from utils.db_pool import get_pool_stats
+from utils.async_db_pool import async_pool
+from utils.semantic_cache import semantic_cache
+from utils.sql_utils import SqlError
 from states.agent_state import AgentState
+from nodes.validate_sql import narrow_question
+from utils.tracing import current_span
 
-def run_query_and_handle_error_node(state: AgentState):
-    result = run_sql_query(state.sql_query)
-    if isinstance(result, str) and "Error" in result:
+def trace_pool_metrics(pool_stats: dict):
+    """Pool and result cache counters on the node span, for sizing both."""
+    node_span = current_span()
+    if node_span is not None:
+        node_span.set(
+            **{f"db_pool_{name}": value for name, value in pool_stats.items()},
+            **{f"result_cache_{name}": value for name, value in result_cache.metrics().items()}
+        )
+
+def handle_query_result(state: AgentState, result):
+    if isinstance(result, SqlError):
+        if state.cache_hit:
+            # Cached SQL no longer runs (e.g. schema changed): drop it and re-analyse
+            semantic_cache.invalidate(state.cached_user_query)
+        clarification = narrow_question(state, result)
+        if clarification is not None:
+            return clarification
         return AgentState(
             user_query=state.user_query,
             db_query=state.db_query,
             general_query=state.general_query,
+            # Kept for the SQL repair prompt (see chatbot.check_success)
+            schema_info=state.schema_info,
+            few_shot_examples=state.few_shot_examples,
             sql_query=state.sql_query,
-            error=result,
+            error=str(result),
+            cache_hit=False,
             loop_count=state.loop_count + 1
         )
 
+    if not state.cache_hit and state.query_embedding is not None and result:
+        semantic_cache.store(
+            state.query_embedding,
+            state.user_query,
+            state.sql_query,
+            state.db_query,
+            state.general_query
+        )
+
     return AgentState(
         user_query=state.user_query,
         db_query=state.db_query,
         general_query=state.general_query,
         sql_query=state.sql_query,
         query_result=result,
+        truncated=result.truncated,
+        error=None,
         loop_count=state.loop_count
     )
+
+def run_query_and_handle_error_node(state: AgentState):
+    result = cached_run_sql_query(state.sql_query)
+    trace_pool_metrics(get_pool_stats())
+    return handle_query_result(state, result)
+
+async def arun_query_and_handle_error_node(state: AgentState):
+    result = await acached_run_sql_query(state.sql_query)
+    trace_pool_metrics(async_pool.stats())
+    return handle_query_result(state, result)
@@ -0,0 +1,59 @@
+from states.agent_state import AgentState
+from config import SQL_GUARD_OVER_COST
+from utils.semantic_cache import semantic_cache
+from utils.sql_utils import SqlError
+from utils.sql_validator import validate_sql, avalidate_sql
+
+NARROW_QUESTION_MESSAGE = (
+    "This question would make the database scan too much data to answer quickly. "
+    "Please narrow it down, for example to a fiscal year or month, a hierarchy level or a cloud provider."
+)
+
+
+def narrow_question(state: AgentState, error: SqlError):
+    """Ask the user to narrow the question instead of repairing SQL the cost guard stopped."""
+    if not error.too_expensive or SQL_GUARD_OVER_COST != "clarify":
+        return None
+    print(f"Asking the user to narrow the question: {error!r}")
+    return AgentState(
+        user_query=state.user_query,
+        sql_query=state.sql_query,
+        clarification=NARROW_QUESTION_MESSAGE,
+        loop_count=state.loop_count
+    )
+
+def handle_validation(state: AgentState, sql_query: str, error: SqlError):
+    if error is None:
+        # The cost guard may have added a LIMIT
+        return AgentState(
+            user_query=state.user_query,
+            sql_query=sql_query,
+            loop_count=state.loop_count
+        )
+
+    if state.cache_hit:
+        # Cached SQL that no longer passes validation: drop it and re-analyse
+        semantic_cache.invalidate(state.cached_user_query)
+    clarification = narrow_question(state, error)
+    if clarification is not None:
+        return clarification
+
+    print(f"SQL rejected before execution: {error!r}")
+    # Same shape as a failed execution, so the rejected SQL goes through the repair loop
+    return AgentState(
+        user_query=state.user_query,
+        db_query=state.db_query,
+        general_query=state.general_query,
+        schema_info=state.schema_info,
+        few_shot_examples=state.few_shot_examples,
+        sql_query=state.sql_query,
+        error=str(error),
+        cache_hit=False,
+        loop_count=state.loop_count + 1
+    )
+
+def validate_sql_node(state: AgentState):
+    return handle_validation(state, *validate_sql(state.sql_query))
+
+async def avalidate_sql_node(state: AgentState):
+    return handle_validation(state, *(await avalidate_sql(state.sql_query)))
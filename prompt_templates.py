@@ -2,13 +2,14 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain.prompts import PromptTemplate
 from utils.schema_utils import fetch_table_names, fetch_table_schema, fetch_table_relations, safe_literal_eval
 import json
+from utils.prompt_budget import truncate_to_tokens, budget_for
 
 def escape_curly_braces(text):
     return text.replace("{", "{{").replace("}", "}}")
 
 def get_analyze_query_prompt(state):
      # Include error context if query execution previously failed
-    error_context = f"⚠ **Previous Query Execution Failed:** {state.error}\n\n" if state.error else ""
+    error_context = f"⚠ **Previous Query Execution Failed:** {truncate_to_tokens(state.error, budget_for('error'))}\n\n" if state.error else ""
 
 #     schema_dict = {
 #     "tables": [
@@ -1014,3 +1015,63 @@ def get_qa_prompt() -> str:
             Now format the output in the string format shown above.
             """
 )
+
+
+def get_chunk_summary_prompt() -> ChatPromptTemplate:
+    """Map step of map-reduce summarisation: condense one chunk of a large query result."""
+    return ChatPromptTemplate.from_messages([
+        ("system", """
+            You are a data analyst assistant. You are given ONE chunk ({chunk_number} of {chunk_count}) of a large SQL query result in CSV format.
+
+            User Question: {user_query}
+            Detailed Intent: {action_query}
+
+            Extract only the facts from this chunk that help answer the question:
+                Totals and counts for the key metrics in this chunk
+                The highest and lowest rows for the key metrics (with their identifying labels)
+                Any unusual values or sudden changes
+                The date range covered, if there are date columns
+
+            Rules:
+                Base everything strictly on the rows in this chunk — do not guess about other chunks
+                Keep numbers exact; no prose introduction or conclusion
+                Answer in at most 8 short bullet points
+
+            CSV Chunk:
+            {chunk}
+        """)
+    ])
+
+
+def get_sql_repair_prompt() -> ChatPromptTemplate:
+    """Repair step of the retry loop: fix the failed SQL using the database error, without re-analysing the question."""
+    return ChatPromptTemplate.from_messages([
+        ("system", """
+            You are a PostgreSQL SQL repair assistant. A query generated for the user's question failed to execute.
+            Fix it so it runs and still answers the question.
+
+            INTERPRETED DB QUERY
+            {db_query}
+
+            DATABASE SCHEMA & RELATIONSHIPS
+            {schema_info}
+
+            SIMILAR QUERIES REFERENCE
+            {chroma_results}
+
+            FAILED SQL
+            {failed_sql}
+
+            DATABASE ERROR
+            {error}
+
+            Rules:
+                Change only what the error points at (unknown column or table, type mismatch, bad join, syntax)
+                Use only the tables, columns and foreign key joins listed in the schema
+                Cast ENUM / USER_DEFINED columns to text before LOWER(), LIKE or ILIKE
+                Keep the selected columns, filters and grouping of the failed SQL unless they cause the error
+
+            Return only the corrected query in a ```sql``` code block.
+        """),
+        ("user", "{input}")
+    ])
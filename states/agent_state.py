@@ -1,17 +1,26 @@
-from pydantic import BaseModel,Field
+from pydantic import BaseModel,Field,ConfigDict
 from typing import Optional, List, Any
 from langchain_core.messages import AIMessage, HumanMessage
+from utils.query_result import QueryResult
 
 # Define the AgentState class
 class AgentState(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     user_query: str
     cypher_details: Optional[str] = None
     general_query: Optional[str] = None
     db_query: Optional[str] = None
     schema_info: Optional[str] = None
     sql_query: Optional[str] = None
-    query_result: Optional[List[dict]] = None
+    query_result: Optional[QueryResult] = None
+    truncated: Optional[bool] = False
     error: Optional[str] = None
     final_response: Optional[AIMessage | HumanMessage] = None
     loop_count: Optional[int] = 0
-    pdf_bytes: Optional[bytes] = None
\ No newline at end of file
+    processed_result: Optional[str] = None
+    query_embedding: Optional[List[float]] = None
+    cache_hit: Optional[bool] = None
+    cached_user_query: Optional[str] = None
+    few_shot_examples: Optional[List[dict]] = None
+    clarification: Optional[str] = None
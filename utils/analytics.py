@@ -0,0 +1,216 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.query_result import QueryResult
+
+# (pandas period frequency, comparison label)
+PERIODS = [("W", "WoW"), ("M", "MoM"), ("Q", "QoQ"), ("Y", "YoY")]
+DATE_NAME_HINTS = ("date", "time", "timestamp", "month", "day", "created", "updated", "period")
+
+
+def _is_text_like(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _is_id_column(name: str) -> bool:
+    name = name.lower()
+    return name == "id" or name.endswith("_id")
+
+
+def detect_date_columns(df: pd.DataFrame) -> List[str]:
+    """Columns holding dates: datetime dtypes, date objects, or date-like strings in date-named columns."""
+    date_columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            date_columns.append(col)
+            continue
+        if not _is_text_like(series):
+            continue
+        non_null = series.dropna()
+        if non_null.empty:
+            continue
+        if non_null.map(lambda v: isinstance(v, (date, datetime))).all():
+            date_columns.append(col)
+        elif any(hint in str(col).lower() for hint in DATE_NAME_HINTS):
+            parsed = pd.to_datetime(non_null.head(50), errors="coerce")
+            if parsed.notna().mean() >= 0.9:
+                date_columns.append(col)
+    return date_columns
+
+
+def detect_numeric_columns(df: pd.DataFrame) -> List[str]:
+    return [
+        col for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col])
+        and not pd.api.types.is_bool_dtype(df[col])
+        and not _is_id_column(str(col))
+    ]
+
+
+def detect_label_column(df: pd.DataFrame, exclude: List[str]) -> Optional[str]:
+    for col in df.columns:
+        if col not in exclude and _is_text_like(df[col]):
+            return col
+    return None
+
+
+def period_over_period(df: pd.DataFrame, date_col: str, numeric_cols: List[str]) -> list:
+    """Totals per week/month/quarter/year bucket and the change of the latest bucket vs. the one before."""
+    dates = pd.to_datetime(df[date_col], errors="coerce", utc=True).dt.tz_localize(None)
+    valid = dates.notna()
+    if valid.sum() < 2 or not numeric_cols:
+        return []
+
+    comparisons = []
+    for freq, label in PERIODS:
+        buckets = dates[valid].dt.to_period(freq)
+        totals = df.loc[valid, numeric_cols].groupby(buckets.values).sum().sort_index()
+        if len(totals) < 2:
+            continue
+        current, previous = totals.iloc[-1], totals.iloc[-2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(previous.to_numpy() != 0, (current.to_numpy() - previous.to_numpy()) / np.abs(previous.to_numpy()) * 100, np.nan)
+        comparisons.append({
+            "comparison": label,
+            "current_period": str(totals.index[-1]),
+            "previous_period": str(totals.index[-2]),
+            "columns": {
+                col: {
+                    "current": float(current[col]),
+                    "previous": float(previous[col]),
+                    "change_pct": None if np.isnan(pct) else round(float(pct), 2),
+                }
+                for col, pct in zip(numeric_cols, change)
+            },
+        })
+    return comparisons
+
+
+def top_bottom(df: pd.DataFrame, numeric_cols: List[str], label_col: Optional[str], k: int) -> dict:
+    ranking = {}
+    for col in numeric_cols:
+        values = df[col]
+        if values.notna().sum() == 0:
+            continue
+        def rows(index):
+            return [
+                {"label": None if label_col is None else df.at[i, label_col], "value": float(values[i])}
+                for i in index
+            ]
+        ranking[col] = {
+            "top": rows(values.nlargest(k).index),
+            "bottom": rows(values.nsmallest(k).index),
+        }
+    return ranking
+
+
+def zscore_anomalies(df: pd.DataFrame, numeric_cols: List[str], label_col: Optional[str], threshold: float, limit: int) -> list:
+    """Values more than `threshold` standard deviations from their column mean."""
+    if not numeric_cols or len(df) < 3:
+        return []
+    values = df[numeric_cols].to_numpy(dtype=np.float64)
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values - mean) / np.where(std == 0, np.nan, std)
+    rows, cols = np.nonzero(np.nan_to_num(np.abs(z)) > threshold)
+    order = np.argsort(-np.abs(z[rows, cols]))[:limit]
+    return [
+        {
+            "column": numeric_cols[cols[i]],
+            "label": None if label_col is None else df.iat[rows[i], df.columns.get_loc(label_col)],
+            "value": float(values[rows[i], cols[i]]),
+            "z_score": round(float(z[rows[i], cols[i]]), 2),
+        }
+        for i in order
+    ]
+
+
+def summarize_result(result: QueryResult, top_k: int = 5, z_threshold: float = 2.0, max_anomalies: int = 10) -> dict:
+    """
+    Deterministic analytics over a query result: column statistics, period-over-period
+    deltas, top/bottom performers and z-score anomalies, all computed vectorised.
+    """
+    df = result.to_dataframe()
+    date_cols = detect_date_columns(df)
+    numeric_cols = detect_numeric_columns(df)
+    label_col = detect_label_column(df, exclude=date_cols)
+
+    numeric = df[numeric_cols]
+    stats = {
+        col: {
+            "count": int(numeric[col].count()),
+            "sum": float(numeric[col].sum()),
+            "mean": float(numeric[col].mean()) if numeric[col].count() else None,
+            "min": float(numeric[col].min()) if numeric[col].count() else None,
+            "max": float(numeric[col].max()) if numeric[col].count() else None,
+        }
+        for col in numeric_cols
+    }
+
+    date_ranges = {}
+    for col in date_cols:
+        dates = pd.to_datetime(df[col], errors="coerce", utc=True).dropna()
+        if not dates.empty:
+            date_ranges[col] = {"from": dates.min().date().isoformat(), "to": dates.max().date().isoformat()}
+
+    return {
+        "row_count": len(df),
+        "truncated": result.truncated,
+        "date_columns": date_ranges,
+        "label_column": label_col,
+        "numeric_stats": stats,
+        "period_comparisons": period_over_period(df, date_cols[0], numeric_cols) if date_cols else [],
+        "top_bottom": top_bottom(df, numeric_cols, label_col, top_k) if len(df) > 1 else {},
+        "anomalies": zscore_anomalies(df, numeric_cols, label_col, z_threshold, max_anomalies),
+        "z_threshold": z_threshold,
+    }
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "n/a"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return str(value)
+
+
+def format_analytics(summary: dict) -> str:
+    """Compact plain-text rendering of `summarize_result` output for the LLM prompt."""
+    lines = [f"Rows: {summary['row_count']}" + (" (truncated)" if summary["truncated"] else "")]
+    for col, span in summary["date_columns"].items():
+        lines.append(f"Date column {col}: {span['from']} to {span['to']}")
+
+    for col, stats in summary["numeric_stats"].items():
+        lines.append(
+            f"{col}: sum={_fmt(stats['sum'])}, mean={_fmt(stats['mean'])}, "
+            f"min={_fmt(stats['min'])}, max={_fmt(stats['max'])}, non-null={stats['count']}"
+        )
+
+    for comparison in summary["period_comparisons"]:
+        changes = ", ".join(
+            f"{col} {_fmt(v['previous'])} -> {_fmt(v['current'])} ({_fmt(v['change_pct'])}%"
+            + (", large shift" if v["change_pct"] is not None and abs(v["change_pct"]) >= 50 else "")
+            + ")"
+            for col, v in comparison["columns"].items()
+        )
+        lines.append(f"{comparison['comparison']} {comparison['previous_period']} -> {comparison['current_period']}: {changes}")
+
+    for col, ranking in summary["top_bottom"].items():
+        top = "; ".join(f"{_fmt(r['label'])}={_fmt(r['value'])}" for r in ranking["top"])
+        bottom = "; ".join(f"{_fmt(r['label'])}={_fmt(r['value'])}" for r in ranking["bottom"])
+        lines.append(f"Top {col}: {top}")
+        lines.append(f"Bottom {col}: {bottom}")
+
+    if summary["anomalies"]:
+        lines.append(f"Anomalies (|z| > {summary['z_threshold']:g}):")
+        for anomaly in summary["anomalies"]:
+            lines.append(f"- {anomaly['column']} {_fmt(anomaly['label'])}={_fmt(anomaly['value'])} (z={anomaly['z_score']})")
+    else:
+        lines.append("Anomalies: none")
+
+    return "\n".join(lines)
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+import asyncpg
+
+from config import (
+    POSTGRES_CONFIG,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+
+class AsyncConnectionPool:
+    """
+    asyncpg counterpart of `utils.db_pool.ConnectionPool` for the async agent graph.
+
+    Sessions are read-only with the same `statement_timeout`; asyncpg resets and
+    replaces broken connections itself. Checkout counts and wait times are tracked
+    the same way so both pools can be sized from one set of numbers.
+
+    An asyncpg pool only works on the event loop that created it, so one is
+    created per running loop: every `asyncio.run(...)` in the process gets its
+    own, and pools of loops that have since closed are dropped.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, statement_timeout_ms: int, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self.connect_kwargs = connect_kwargs
+        self._pools: Dict[asyncio.AbstractEventLoop, asyncpg.Pool] = {}
+        self._init_locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+        self._stats = {
+            "max_size": maxconn,
+            "in_use": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _forget_closed_loops(self):
+        # Their connections died with the loop; nothing is left to close
+        for loop in [loop for loop in self._init_locks if loop.is_closed()]:
+            self._pools.pop(loop, None)
+            del self._init_locks[loop]
+
+    async def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            self._forget_closed_loops()
+            # asyncio.Lock is bound to one loop as well
+            async with self._init_locks.setdefault(loop, asyncio.Lock()):
+                pool = self._pools.get(loop)
+                if pool is None:
+                    pool = self._pools[loop] = await asyncpg.create_pool(
+                        database=self.connect_kwargs["database"],
+                        user=self.connect_kwargs["user"],
+                        password=self.connect_kwargs["password"],
+                        host=self.connect_kwargs["host"],
+                        port=int(self.connect_kwargs["port"]),
+                        min_size=self.minconn,
+                        max_size=self.maxconn,
+                        server_settings={
+                            "statement_timeout": str(self.statement_timeout_ms),
+                            "default_transaction_read_only": "on",
+                        },
+                    )
+        return pool
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for the duration of the `async with` block."""
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+
+        waited = time.perf_counter() - start
+        self._stats["checkouts"] += 1
+        self._stats["in_use"] += 1
+        self._stats["total_wait_seconds"] += waited
+        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        try:
+            yield conn
+        finally:
+            self._stats["in_use"] -= 1
+            await pool.release(conn)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        checkouts = stats["checkouts"]
+        stats["avg_wait_seconds"] = stats["total_wait_seconds"] / checkouts if checkouts else 0.0
+        return stats
+
+    async def close(self):
+        """Close the pool of the running event loop; call it before that loop ends."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.close()
+
+
+async_pool = AsyncConnectionPool(
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+    **POSTGRES_CONFIG,
+)
+
+
+def get_async_connection():
+    """Borrow a pooled asyncpg connection: `async with get_async_connection() as conn: ...`."""
+    return async_pool.connection()
@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from config import (
+    POSTGRES_CONFIG,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of long-lived, read-only Postgres connections.
+
+    Connections are opened with a per-connection `statement_timeout` and in
+    read-only transaction mode, health-checked on checkout and rolled back on
+    return. Callers block (up to `timeout` seconds) when all connections are
+    in use instead of failing immediately.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, statement_timeout_ms: int, **connect_kwargs):
+        self.timeout = timeout
+        self._connect_kwargs = dict(connect_kwargs)
+        self._connect_kwargs["options"] = f"-c statement_timeout={statement_timeout_ms}"
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **self._connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._stats = {
+            "max_size": maxconn,
+            "in_use": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "failed_health_checks": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _checkout(self):
+        """Take a healthy connection from the pool, replacing broken ones."""
+        conn = self._pool.getconn()
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error:
+            with self._lock:
+                self._stats["failed_health_checks"] += 1
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        conn.set_session(readonly=True, autocommit=False)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the `with` block."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+        try:
+            yield conn
+        finally:
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self._pool.putconn(conn, close=broken)
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Snapshot of checkout counts and wait times, for sizing the pool."""
+        with self._lock:
+            stats = dict(self._stats)
+        checkouts = stats["checkouts"]
+        stats["avg_wait_seconds"] = stats["total_wait_seconds"] / checkouts if checkouts else 0.0
+        return stats
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_POOL_MIN_SIZE,
+                    DB_POOL_MAX_SIZE,
+                    DB_POOL_TIMEOUT,
+                    DB_STATEMENT_TIMEOUT_MS,
+                    **POSTGRES_CONFIG,
+                )
+    return _pool
+
+
+def get_connection():
+    """Borrow a pooled connection: `with get_connection() as conn: ...`."""
+    return get_pool().connection()
+
+
+def get_pool_stats() -> dict:
+    """Pool wait time and checkout counters (empty until the pool is used)."""
+    return _pool.stats() if _pool is not None else {}
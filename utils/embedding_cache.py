@@ -0,0 +1,130 @@
+import array
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """Persistent content-hash -> vector store backed by a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("f", blob).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(key, array.array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with batching, a bounded worker pool and a disk cache.
+
+    Texts are keyed by a hash of (model name, text); only cache misses are sent to
+    the model, `batch_size` texts per `embed_documents` call with at most
+    `max_workers` calls in flight. `computed` counts embeddings actually requested
+    from the model.
+    """
+
+    def __init__(self, model: Embeddings, cache_path: str, batch_size: int = 32, max_workers: int = 4):
+        self.model = model
+        self.cache = EmbeddingCache(cache_path)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.model_name = getattr(model, "model", type(model).__name__)
+        self.computed = 0
+        self._counter_lock = threading.Lock()
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _missing(self, texts: List[str]):
+        hashes = [self._hash(text) for text in texts]
+        cached = self.cache.get_many(hashes)
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached:
+                missing[key] = text
+        return hashes, cached, missing
+
+    def _batches(self, missing: Dict[str, str]):
+        keys = list(missing)
+        return [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+
+    def _record(self, vectors: Dict[str, List[float]]):
+        self.cache.put_many(vectors)
+        with self._counter_lock:
+            self.computed += len(vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._missing(texts)
+        if missing:
+            batches = self._batches(missing)
+
+            def embed_batch(keys):
+                return dict(zip(keys, self.model.embed_documents([missing[key] for key in keys])))
+
+            computed = {}
+            if len(batches) == 1:
+                computed.update(embed_batch(batches[0]))
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    for result in executor.map(embed_batch, batches):
+                        computed.update(result)
+            self._record(computed)
+            cached.update(computed)
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = await asyncio.to_thread(self._missing, texts)
+        if missing:
+            semaphore = asyncio.Semaphore(self.max_workers)
+
+            async def embed_batch(keys):
+                async with semaphore:
+                    vectors = await self.model.aembed_documents([missing[key] for key in keys])
+                return dict(zip(keys, vectors))
+
+            computed = {}
+            for result in await asyncio.gather(*(embed_batch(keys) for keys in self._batches(missing))):
+                computed.update(result)
+            await asyncio.to_thread(self._record, computed)
+            cached.update(computed)
+        return [cached[key] for key in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(candidates: np.ndarray, query_scores: np.ndarray, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance over unit-normalized `candidates`.
+
+    Pairwise similarities are computed once as a matrix product; each of the `k`
+    picks is then a vectorized max/argmax over the remaining candidates.
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    pairwise = candidates @ candidates.T
+    max_sim_to_selected = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    selected = [int(np.argmax(query_scores))]
+    available[selected[0]] = False
+    while len(selected) < min(k, n):
+        max_sim_to_selected = np.maximum(max_sim_to_selected, pairwise[selected[-1]])
+        scores = lambda_mult * query_scores - (1 - lambda_mult) * max_sim_to_selected
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+    return selected
+
+
+class NumpyFewShotIndex:
+    """
+    Few-shot example retriever backed by a memory-mapped `.npy` embedding matrix
+    and a JSON metadata sidecar.
+
+    Rows are stored unit-normalized, so cosine scoring is a single matrix-vector
+    product; MMR re-ranking runs on the `fetch_k` best candidates. Exposes the
+    same `max_marginal_relevance_search` API as the Chroma vector store.
+    """
+
+    def __init__(self, embeddings: np.ndarray, documents: List[dict], embedding_function=None, source_hash: str = None):
+        self.embeddings = embeddings
+        self.documents = documents
+        self.embedding_function = embedding_function
+        self.source_hash = source_hash
+
+    @staticmethod
+    def source_hash_for(documents: List[dict]) -> str:
+        return hashlib.sha256(json.dumps(documents, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def build(cls, documents: List[dict], embedding_function, index_dir: str) -> "NumpyFewShotIndex":
+        """Embed each document's `page_content` and persist matrix + sidecar to `index_dir`."""
+        vectors = embedding_function.embed_documents([doc["page_content"] for doc in documents])
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        source_hash = cls.source_hash_for(documents)
+
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, EMBEDDINGS_FILE), matrix)
+        with open(os.path.join(index_dir, METADATA_FILE), "w") as f:
+            json.dump({"source_hash": source_hash, "documents": documents}, f)
+        return cls.load(index_dir, embedding_function)
+
+    @classmethod
+    def load(cls, index_dir: str, embedding_function=None) -> "NumpyFewShotIndex":
+        matrix = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, METADATA_FILE), "r") as f:
+            sidecar = json.load(f)
+        return cls(matrix, sidecar["documents"], embedding_function, sidecar.get("source_hash"))
+
+    @classmethod
+    def load_or_build(cls, documents: List[dict], embedding_function, index_dir: str) -> "NumpyFewShotIndex":
+        """Reuse the on-disk index unless the source documents changed since it was built."""
+        try:
+            index = cls.load(index_dir, embedding_function)
+            if index.source_hash == cls.source_hash_for(documents):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls.build(documents, embedding_function, index_dir)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5) -> List[Document]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self.embeddings @ query
+        fetch_k = min(fetch_k, len(scores))
+        if fetch_k == 0:
+            return []
+        if fetch_k < len(scores):
+            candidates = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        picked = mmr_select(np.asarray(self.embeddings[candidates]), scores[candidates], k, lambda_mult)
+        return [
+            Document(page_content=self.documents[i]["page_content"], metadata=self.documents[i].get("metadata", {}))
+            for i in candidates[picked]
+        ]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5) -> List[Document]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult)
+
+    async def amax_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5) -> List[Document]:
+        return await asyncio.to_thread(self.max_marginal_relevance_search_by_vector, embedding, k, fetch_k, lambda_mult)
+
+    async def amax_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5) -> List[Document]:
+        embedding = await self.embedding_function.aembed_query(query)
+        return await self.amax_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult)
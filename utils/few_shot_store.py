@@ -0,0 +1,72 @@
+import hashlib
+import json
+import re
+from typing import List
+
+from FAQ import sample_queries
+from utils.sql_utils import extract_tables
+
+_PARAM_PATTERN = re.compile(r"([\w\.]+)\s*(?:=|<>|!=|<=|>=|<|>|\blike\b|\bin\b)\s*\(?\s*\?", re.IGNORECASE)
+
+
+def _example_document(item: dict) -> dict:
+    sql = item["answer"]
+    return {
+        "page_content": item["question"],
+        "metadata": {
+            "question": item["question"],
+            "sql": sql,
+            "params": [name.split(".")[-1] for name in _PARAM_PATTERN.findall(sql)],
+            "tables": extract_tables(sql) or [],
+        },
+    }
+
+
+def load_few_shot_documents() -> List[dict]:
+    """Few-shot examples from FAQ.py, each carrying its SQL, parameters and tables as metadata."""
+    return [_example_document(item) for item in sample_queries]
+
+
+def example_from_document(doc) -> dict:
+    """Ready-to-use example from a retrieved Document (NumPy index or Chroma)."""
+    metadata = doc.metadata or {}
+    example = {
+        "question": metadata.get("question", doc.page_content),
+        "sql": metadata.get("sql"),
+        "params": metadata.get("params", []),
+        "tables": metadata.get("tables", []),
+    }
+    # Chroma metadata values must be scalars, lists are stored as JSON strings there
+    for key in ("params", "tables"):
+        if isinstance(example[key], str):
+            example[key] = json.loads(example[key])
+    return example
+
+
+def _document_id(document: dict) -> str:
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def sync_chroma_examples(store, documents: List[dict]) -> dict:
+    """Make a LangChain Chroma store hold exactly `documents`, embedding only new/changed ones."""
+    desired = {_document_id(doc): doc for doc in documents}
+    existing = set(store.get(include=[])["ids"])
+    to_add = [doc_id for doc_id in desired if doc_id not in existing]
+    to_delete = [doc_id for doc_id in existing if doc_id not in desired]
+
+    if to_add:
+        store.add_texts(
+            texts=[desired[doc_id]["page_content"] for doc_id in to_add],
+            metadatas=[
+                {key: json.dumps(value) if isinstance(value, list) else value
+                 for key, value in desired[doc_id]["metadata"].items()}
+                for doc_id in to_add
+            ],
+            ids=to_add,
+        )
+    if to_delete:
+        store.delete(ids=to_delete)
+
+    report = {"added": len(to_add), "deleted": len(to_delete), "unchanged": len(desired) - len(to_add)}
+    print(f"Few-shot Chroma sync: {report}")
+    return report
@@ -1,29 +1,63 @@
 import re
-import json
-import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
-from config import llm
-from utils.decimal_encoder import DecimalEncoder
+from config import llm, ANALYTICS_SAMPLE_ROWS, ANALYTICS_TOP_K, ANALYTICS_Z_THRESHOLD
+from config import MAP_REDUCE_ROW_THRESHOLD, MAP_REDUCE_CHUNK_TOKENS, MAP_REDUCE_MAX_CONCURRENCY
+from utils.prompt_budget import fit_lines, budget_for, log_prompt_tokens, count_tokens, split_lines_into_chunks, truncate_to_tokens
+from prompt_templates import get_chunk_summary_prompt
+from utils.analytics import summarize_result, format_analytics
+
+# Tag on the user-facing summarisation call; app.py streams tokens from LLM runs carrying it
+FINAL_ANSWER_TAG = "final_answer"
+
+def needs_map_reduce(query_result) -> bool:
+    """Large results are summarised chunk by chunk (map) before the final answer (reduce)."""
+    if len(query_result) > MAP_REDUCE_ROW_THRESHOLD:
+        return True
+    return count_tokens(query_result.to_csv()) > budget_for("data")
+
+
+def build_chunk_prompts(state) -> list:
+    """Map-step prompts, one per token-sized chunk of the full result CSV."""
+    chunks = split_lines_into_chunks(state.query_result.to_csv(), MAP_REDUCE_CHUNK_TOKENS)
+    prompt_template = get_chunk_summary_prompt()
+    return [
+        prompt_template.format(
+            chunk_number=i + 1,
+            chunk_count=len(chunks),
+            user_query=state.user_query,
+            action_query=state.general_query,
+            chunk=chunk
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def join_chunk_findings(responses) -> str:
+    findings = "\n\n".join(
+        f"Chunk {i + 1}:\n{response.content.strip()}" for i, response in enumerate(responses)
+    )
+    # The reduce prompt must stay bounded no matter how many chunks there were
+    return truncate_to_tokens(findings, budget_for("data"))
 
-def apply_general_processing_with_llm(state):
+
+def build_processing_prompt(state, chunk_findings: str = None):
     """
-    Uses LLM to process query results based on the general_query instructions.
-    This allows LLM to handle summarization, ranking, comparisons, etc.
+    Build the summarisation prompt for the query result and general_query instructions.
+    With `chunk_findings` (map-reduce mode) this is the reduce prompt.
     """
     query_result = state.query_result
     action_query=state.general_query
     user_query=state.user_query
-    # Convert query result into structured JSON format for LLM
-    formatted_data = json.dumps({'query_result':  query_result}, indent=2, cls=DecimalEncoder)
-
-    df = pd.DataFrame(json.loads(formatted_data))
-    parsed_data=df.to_csv()
+    # Comparisons, rankings and anomalies are computed here rather than by the LLM;
+    # only that summary plus a small sample of rows goes into the prompt
+    analytics = format_analytics(summarize_result(query_result, top_k=ANALYTICS_TOP_K, z_threshold=ANALYTICS_Z_THRESHOLD))
+    parsed_data = fit_lines(query_result.to_csv(max_rows=ANALYTICS_SAMPLE_ROWS), budget_for("data"))
     parsed_data_safe = parsed_data.replace('{', '{{').replace('}', '}}')
   
     
     # If no additional processing is required, return the raw results
     if action_query.lower() == "no additional processing required.":
-        action_query=query_result
+        action_query=parsed_data
 
     # Construct LLM Prompt
     system_message = (
@@ -32,7 +66,8 @@ def apply_general_processing_with_llm(state):
 
         You will be provided with:
 
-            SQL return data in tabular (JSON or CSV) format
+            Precomputed analytics for the full SQL result (statistics, period-over-period changes, top/bottom performers, anomalies)
+            A sample of the SQL return data in CSV format
             A user’s primary and detailed question
 
         Your responsibilities:
@@ -42,10 +77,9 @@ def apply_general_processing_with_llm(state):
                 Identify the intent behind the user’s question (summarize it in ≤15 words)
 
             Analyze the dataset
-                Detect any date/time columns, and derive relevant period labels (week, month, quarter, year)
-                Calculate time-based comparisons where possible (WoW, MoM, QoQ, YoY)
-                Identify top and bottom performers for key metrics
-                Detect anomalies (values > ±2σ from the mean or changes ≥50%)
+                Use the precomputed time-based comparisons (WoW, MoM, QoQ, YoY) as given — do not recalculate them
+                Use the precomputed top and bottom performers for key metrics
+                Use the precomputed anomalies (values > ±2σ from the mean or changes ≥50%, marked "large shift")
                 If annotations exist, explain their meaning in the context of the data (e.g., hierarchy, filters)
 
             Generate clear, human-friendly insights
@@ -59,7 +93,9 @@ def apply_general_processing_with_llm(state):
         🧾 Input Format
             User Question: {user_query}
             Detailed Intent: {action_query}
-            Structured Data: {parsed_data_safe}
+            Precomputed Analytics: {analytics}
+            Data Sample: {parsed_data_safe}
+            Findings From All Rows: {chunk_findings}
 
         ✅ Output Format (Markdown Only)
             Insight Summary
@@ -87,15 +123,20 @@ def apply_general_processing_with_llm(state):
         ("system", system_message)
     ])
     
-    # Invoke LLM for processing
-    response = llm.invoke(prompt_template.format(
+    prompt = prompt_template.format(
         user_query=user_query,
         action_query=action_query,
         sql_query=state.sql_query,
-        parsed_data_safe=parsed_data_safe
-    ))
+        analytics=analytics,
+        parsed_data_safe=parsed_data_safe,
+        chunk_findings=chunk_findings or "Not needed, the data sample covers the full result."
+    )
+    log_prompt_tokens("respond", prompt)
+    return prompt
+
 
-    processed_result = response.content.strip()
+def parse_processed_output(processed_result: str) -> str:
+    processed_result = processed_result.strip()
 
     # Extract structured output using regex
     processed_match = re.search(r"Processed Output:\s*(.+)", processed_result, re.DOTALL | re.IGNORECASE)
@@ -104,6 +145,37 @@ def apply_general_processing_with_llm(state):
     return final_output
 
 
+def apply_general_processing_with_llm(state):
+    """
+    Uses LLM to process query results based on the general_query instructions.
+    This allows LLM to handle summarization, ranking, comparisons, etc.
+    """
+    chunk_findings = None
+    if needs_map_reduce(state.query_result):
+        # Map: summarise chunks concurrently, bounded so Ollama is not flooded
+        prompts = build_chunk_prompts(state)
+        print(f"Map-reduce summarisation over {len(prompts)} chunks")
+        responses = llm.batch(prompts, config={"max_concurrency": MAP_REDUCE_MAX_CONCURRENCY})
+        chunk_findings = join_chunk_findings(responses)
+
+    # Invoke LLM for processing (reduce step in map-reduce mode)
+    response = llm.invoke(build_processing_prompt(state, chunk_findings), config={"tags": [FINAL_ANSWER_TAG]})
+    return parse_processed_output(response.content)
+
+
+async def aapply_general_processing_with_llm(state):
+    """Async variant of `apply_general_processing_with_llm`."""
+    chunk_findings = None
+    if needs_map_reduce(state.query_result):
+        prompts = build_chunk_prompts(state)
+        print(f"Map-reduce summarisation over {len(prompts)} chunks")
+        responses = await llm.abatch(prompts, config={"max_concurrency": MAP_REDUCE_MAX_CONCURRENCY})
+        chunk_findings = join_chunk_findings(responses)
+
+    response = await llm.ainvoke(build_processing_prompt(state, chunk_findings), config={"tags": [FINAL_ANSWER_TAG]})
+    return parse_processed_output(response.content)
+
+
 def format_schema_to_string(schema_array):
     """
     Convert structured schema data into a human-readable string format.
@@ -4,6 +4,17 @@ from io import BytesIO
 import tempfile
 import os
 import re
+import numpy as np
+from config import REPORT_MAX_TABLE_ROWS, REPORT_TABLE_FONT_SIZE
+from utils.query_result import QueryResult
+from utils.tracing import span
+
+TABLE_HEADER_FILL = (175, 238, 238)   # paleturquoise, as in the on-screen table
+TABLE_ROW_FILL = (230, 230, 250)      # lavender, every other row
+TABLE_ROW_HEIGHT = 5
+TABLE_CELL_PADDING = 2
+TABLE_MAX_COLUMN_WIDTH = 70
+
  # Handle bold formatting in analysis (e.g. **bold text**)
 def write_formatted_text(text, pdf):
     parts = re.split(r'(\*\*.*?\*\*)', text)
@@ -16,15 +27,109 @@ def write_formatted_text(text, pdf):
             pdf.write(6, part)
     pdf.ln(8)
 
-def generate_pdf_report(user_query: str, analysis: str, fig) -> bytes:
-    # Convert Plotly figure to PNG image bytes
-    image_bytes = to_image(fig, format="png", width=1000, height=800)
+def _pdf_text(value, fractional: bool = True) -> str:
+    # Core PDF fonts only cover latin-1
+    if isinstance(value, float):
+        value = f"{value:,.2f}" if fractional else f"{value:.0f}"
+    return str(value).replace("\n", " ").encode("latin-1", "replace").decode("latin-1")
+
+def _has_fraction(col: np.ndarray) -> bool:
+    """
+    True for float columns holding non-integer values. Nullable integers and
+    whole `numeric` values also arrive as float64 and are printed as integers.
+    """
+    if col.dtype.kind != "f":
+        return False
+    finite = col[np.isfinite(col)]
+    return bool(np.any(finite != np.round(finite)))
+
+def _fit_text(pdf, text: str, width: float) -> str:
+    """Cut `text` with an ellipsis so it fits in a cell of `width` mm."""
+    full_width = pdf.get_string_width(text)
+    if full_width <= width:
+        return text
+    # Proportional first guess, then a few characters either way to the exact cut
+    cut = int(len(text) * width / full_width)
+    while cut < len(text) and pdf.get_string_width(text[:cut + 1] + "...") <= width:
+        cut += 1
+    while cut > 0 and pdf.get_string_width(text[:cut] + "...") > width:
+        cut -= 1
+    return text[:cut] + "..."
+
+def compute_column_widths(pdf, headers, columns, available_width: float):
+    """
+    Width per column from its widest header/cell text (capped), scaled down
+    proportionally when the table is wider than the page.
+    """
+    widths = []
+    for header, values in zip(headers, columns):
+        pdf.set_font("Arial", "B", REPORT_TABLE_FONT_SIZE)
+        widest = pdf.get_string_width(header)
+        pdf.set_font("Arial", "", REPORT_TABLE_FONT_SIZE)
+        if values:
+            # Only the longest strings can be the widest, measure those
+            lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+            for i in np.argsort(-lengths)[:20]:
+                widest = max(widest, pdf.get_string_width(values[i]))
+        widths.append(min(widest + 2 * TABLE_CELL_PADDING, TABLE_MAX_COLUMN_WIDTH))
+
+    total = sum(widths)
+    if total > available_width:
+        widths = [w * available_width / total for w in widths]
+    return widths
+
+def _table_header(pdf, headers, widths):
+    pdf.set_font("Arial", "B", REPORT_TABLE_FONT_SIZE)
+    pdf.set_fill_color(*TABLE_HEADER_FILL)
+    for header, width in zip(headers, widths):
+        pdf.cell(width, TABLE_ROW_HEIGHT + 1, _fit_text(pdf, header, width - TABLE_CELL_PADDING), border=1, fill=1)
+    pdf.ln()
+    pdf.set_font("Arial", "", REPORT_TABLE_FONT_SIZE)
+    pdf.set_fill_color(*TABLE_ROW_FILL)
+
+def write_result_table(pdf, result: QueryResult, max_rows: int = REPORT_MAX_TABLE_ROWS):
+    """Render the query result as a native PDF table, repeating the header row on every page."""
+    shown = result.head(max_rows)
+    headers = [_pdf_text(col) for col in shown.columns]
+    columns = [
+        [_pdf_text(v, _has_fraction(col)) for v in values]
+        for col, values in zip(shown.data, shown.display_values(null="-"))
+    ]
+    numeric = [col.dtype.kind in "if" for col in shown.data]
+    widths = compute_column_widths(pdf, headers, columns, pdf.w - pdf.l_margin - pdf.r_margin)
+
+    _table_header(pdf, headers, widths)
+    for row_index, row in enumerate(zip(*columns)):
+        # Break pages ourselves so a row is never split and the header is repeated
+        if pdf.get_y() + TABLE_ROW_HEIGHT > pdf.page_break_trigger:
+            pdf.add_page()
+            _table_header(pdf, headers, widths)
+        fill = row_index % 2
+        for text, width, is_numeric in zip(row, widths, numeric):
+            pdf.cell(width, TABLE_ROW_HEIGHT, _fit_text(pdf, text, width - TABLE_CELL_PADDING),
+                     border=1, align="R" if is_numeric else "L", fill=fill)
+        pdf.ln()
+
+    if len(result) > len(shown) or result.truncated:
+        pdf.ln(2)
+        pdf.set_font("Arial", "I", REPORT_TABLE_FONT_SIZE)
+        pdf.cell(0, TABLE_ROW_HEIGHT, f"Showing the first {len(shown)} rows.")
+        pdf.ln()
+
+def write_chart(pdf, fig):
+    # Image export (kaleido) is only used for real charts, tables are drawn natively
+    with span("kaleido.to_image", kind="kaleido"):
+        image_bytes = to_image(fig, format="png", width=1000, height=800)
 
     # Save image temporarily
     with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_img:
         tmp_img.write(image_bytes)
         tmp_img_path = tmp_img.name
 
+    pdf.image(tmp_img_path, x=10, w=180)
+    os.remove(tmp_img_path)
+
+def generate_pdf_report(user_query: str, analysis: str, result: QueryResult = None, chart=None) -> bytes:
     # Build PDF
     pdf = FPDF()
     pdf.add_page()
@@ -43,9 +148,15 @@ def generate_pdf_report(user_query: str, analysis: str, fig) -> bytes:
     for line in analysis.split('\n'):
         write_formatted_text(line, pdf)
 
-    # Insert image
-    pdf.image(tmp_img_path, x=10, w=180)
-    os.remove(tmp_img_path)
+    if result:
+        pdf.ln(4)
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, "Query Result:")
+        pdf.ln(10)
+        write_result_table(pdf, result)
+
+    if chart is not None:
+        write_chart(pdf, chart)
 
     # Return as bytes
     return pdf.output(dest="S").encode("latin1", 'replace')
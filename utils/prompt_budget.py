@@ -0,0 +1,111 @@
+from functools import lru_cache
+from typing import Callable, List
+
+import tiktoken
+
+from config import PROMPT_TOKEN_ENCODING, PROMPT_BUDGETS
+
+TRUNCATION_MARKER = "\n…[truncated]"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        return tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+    except Exception as e:
+        # The BPE file is downloaded on first use; without it fall back to ~4 chars/token
+        print(f"⚠️ Warning: Could not load tiktoken encoding '{PROMPT_TOKEN_ENCODING}'. Error: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def budget_for(section: str) -> int:
+    return PROMPT_BUDGETS[section]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens` tokens, marking the cut."""
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4] + TRUNCATION_MARKER
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + TRUNCATION_MARKER
+
+
+def fit_items(items: List, max_tokens: int, render: Callable = str) -> List:
+    """
+    Keep the leading `items` (ordered most relevant first) whose rendered text
+    fits in `max_tokens`; lower-relevance items at the tail are dropped.
+    """
+    kept, used = [], 0
+    for item in items:
+        cost = count_tokens(render(item))
+        if used + cost > max_tokens:
+            break
+        kept.append(item)
+        used += cost
+    return kept
+
+
+def fit_schema(schema_info: str, max_tokens: int) -> str:
+    """
+    Fit a formatted schema (blank-line separated table blocks, primary tables
+    first) into the budget by dropping trailing related tables; a single block
+    that is still too large is truncated.
+    """
+    if not schema_info or count_tokens(schema_info) <= max_tokens:
+        return schema_info
+    blocks = [block for block in schema_info.split("\n\n") if block.strip()]
+    kept = fit_items(blocks, max_tokens)
+    if not kept:
+        return truncate_to_tokens(blocks[0], max_tokens)
+    return "\n\n".join(kept)
+
+
+def fit_lines(text: str, max_tokens: int, keep_header: bool = True) -> str:
+    """Keep the first lines of `text` (e.g. CSV rows) that fit, always keeping the header line."""
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines()
+    header = lines[:1] if keep_header else []
+    body = lines[1:] if keep_header else lines
+    kept = fit_items(body, max_tokens - count_tokens("\n".join(header)))
+    return "\n".join(header + kept + [f"…[{len(body) - len(kept)} more rows truncated]"])
+
+
+def split_lines_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split `text` (e.g. CSV) into chunks of whole lines of at most ~`max_tokens`, repeating the header line."""
+    lines = text.splitlines()
+    if not lines:
+        return []
+    header, body = lines[0], lines[1:]
+    budget = max(max_tokens - count_tokens(header), 1)
+    chunks, current, used = [], [], 0
+    for line in body:
+        cost = count_tokens(line) + 1
+        if current and used + cost > budget:
+            chunks.append("\n".join([header] + current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append("\n".join([header] + current))
+    return chunks
+
+
+def log_prompt_tokens(node: str, prompt) -> int:
+    """Count and log the tokens of the final prompt sent by `node`."""
+    if hasattr(prompt, "to_string"):
+        prompt = prompt.to_string()
+    tokens = count_tokens(str(prompt))
+    print(f"Prompt tokens [{node}]: {tokens}")
+    return tokens
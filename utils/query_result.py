@@ -0,0 +1,116 @@
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _to_column_array(values: Sequence[Any]) -> np.ndarray:
+    """
+    Convert one column of raw DB values into a typed NumPy array.
+
+    Integer columns become int64 (float64 if they contain NULLs), numeric/Decimal
+    columns become float64 with NaN for NULL, everything else stays an object array.
+    """
+    non_null = [v for v in values if v is not None]
+    if non_null and all(isinstance(v, bool) for v in non_null):
+        if len(non_null) == len(values):
+            return np.array(values, dtype=bool)
+        return np.array(values, dtype=object)
+    if non_null and all(isinstance(v, int) and not isinstance(v, bool) for v in non_null):
+        if len(non_null) == len(values):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if non_null and all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in non_null):
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class QueryResult:
+    """
+    Columnar SQL result built once in `run_sql_query` and read by every consumer.
+
+    Holds the column names and one typed NumPy array per column, so rendering,
+    summarisation and report generation never rebuild per-row dictionaries or
+    round-trip through JSON.
+    """
+
+    def __init__(self, columns: List[str], data: List[np.ndarray], truncated: bool = False):
+        self.columns = list(columns)
+        self.data = list(data)
+        self.truncated = truncated
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: List[tuple], truncated: bool = False) -> "QueryResult":
+        """Transpose DB row tuples into typed column arrays."""
+        if rows:
+            raw_columns = list(zip(*rows))
+        else:
+            raw_columns = [() for _ in columns]
+        return cls(columns, [_to_column_array(values) for values in raw_columns], truncated)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __bool__(self) -> bool:
+        return self.row_count > 0
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[self.columns.index(name)]
+
+    def head(self, n: int) -> "QueryResult":
+        """First `n` rows, sharing the underlying arrays (no copy)."""
+        return QueryResult(self.columns, [col[:n] for col in self.data], self.truncated)
+
+    def take(self, indices) -> "QueryResult":
+        """Rows at `indices` (a slice or index array)."""
+        return QueryResult(self.columns, [col[indices] for col in self.data], self.truncated)
+
+    def iter_rows(self) -> Iterator[tuple]:
+        return zip(*self.data)
+
+    def display_values(self, null: str = "—") -> List[List[Any]]:
+        """Column-wise values with NULL/NaN replaced by `null`, for tables and reports."""
+        output = []
+        for col in self.data:
+            if col.dtype == np.float64:
+                values = [null if np.isnan(v) else v for v in col.tolist()]
+            else:
+                values = [null if v is None else v for v in col.tolist()]
+            output.append(values)
+        return output
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(self.columns, self.data)), columns=self.columns)
+
+    def to_csv(self, max_rows: int = None) -> str:
+        result = self.head(max_rows) if max_rows is not None else self
+        return result.to_dataframe().to_csv()
+
+    def to_records(self) -> List[dict]:
+        """Row dictionaries with JSON-friendly values (only for callers that need them)."""
+        records = []
+        for row in self.iter_rows():
+            record = {}
+            for name, value in zip(self.columns, row):
+                if isinstance(value, np.generic):
+                    value = value.item()
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                elif isinstance(value, Decimal):
+                    value = float(value)
+                elif isinstance(value, (datetime, date)):
+                    value = value.isoformat()
+                record[name] = value
+            records.append(record)
+        return records
+
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns}, rows={self.row_count}, truncated={self.truncated})"
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Optional
+
+from config import REPORT_WORKERS, REPORT_CACHE_MAX_ENTRIES
+from utils.generate_report import generate_pdf_report
+from utils.query_result import QueryResult
+from utils.tracing import span
+
+
+class ReportWorker:
+    """
+    Builds PDF reports off the request path.
+
+    Jobs run on a small thread pool and their futures are cached by report id
+    (one id per answered message), so a report is generated at most once and a
+    download after the first one is served from memory.
+    """
+
+    def __init__(self, max_workers: int = REPORT_WORKERS, max_entries: int = REPORT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-report")
+        self._jobs: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, report_id: str, user_query: str, analysis: str, result: QueryResult = None) -> Future:
+        """Start building the report unless it is already queued, running or done."""
+        with self._lock:
+            job = self._jobs.get(report_id)
+            if job is None:
+                job = self._executor.submit(self._build, report_id, user_query, analysis, result)
+                self._jobs[report_id] = job
+            self._jobs.move_to_end(report_id)
+            self._evict()
+            return job
+
+    @staticmethod
+    def _build(report_id: str, user_query: str, analysis: str, result: QueryResult) -> bytes:
+        # Runs outside the request, so it is recorded as its own trace
+        with span("pdf_report", kind="report", report_id=report_id, rows=len(result) if result else 0):
+            return generate_pdf_report(user_query, analysis, result)
+
+    def _evict(self):
+        # Drop the least recently used finished reports; running jobs are kept
+        for report_id in list(self._jobs):
+            if len(self._jobs) <= self.max_entries:
+                break
+            if self._jobs[report_id].done():
+                del self._jobs[report_id]
+
+    def is_ready(self, report_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(report_id)
+        return job is not None and job.done() and job.exception() is None
+
+    def is_running(self, report_id: str) -> bool:
+        """Queued or still building (e.g. after `get` timed out)."""
+        with self._lock:
+            job = self._jobs.get(report_id)
+        return job is not None and not job.done()
+
+    def get(self, report_id: str, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Finished PDF bytes, waiting up to `timeout` seconds; None if unknown or failed."""
+        with self._lock:
+            job = self._jobs.get(report_id)
+        if job is None:
+            return None
+        try:
+            return job.result(timeout=timeout)
+        except TimeoutError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Warning: PDF report {report_id} failed. Error: {e}")
+            # Forget the failed job so a later submit retries it
+            self.discard(report_id)
+            return None
+
+    def discard(self, report_id: str):
+        with self._lock:
+            job = self._jobs.pop(report_id, None)
+        if job is not None:
+            job.cancel()
+
+
+report_worker = ReportWorker()
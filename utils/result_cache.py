@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_ROWS,
+    RESULT_CACHE_WATERMARK_INTERVAL,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_MAX_AGE,
+)
+from utils.db_pool import get_connection
+from utils.async_db_pool import get_async_connection
+from utils.run_sql_query import run_sql_query, arun_sql_query
+from utils.sql_utils import normalize_sql, extract_tables, is_volatile_sql, SqlError
+from utils.tracing import span, current_span
+
+# Write counters from the statistics views: cheap to read (no table scan) and
+# moved by every INSERT, UPDATE (in-place ones too), DELETE and TRUNCATE
+_WATERMARK_SQL = """
+SELECT relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup
+FROM pg_stat_user_tables
+WHERE schemaname = current_schema() AND relname = ANY({param})
+"""
+WATERMARK_QUERY = _WATERMARK_SQL.format(param="%s")     # psycopg2
+AWATERMARK_QUERY = _WATERMARK_SQL.format(param="$1")    # asyncpg
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of query results keyed by normalized SQL text.
+
+    Each entry remembers the watermark (the pg_stat_user_tables write counters)
+    of every table it read. When a watermark moves the entry is stale and the
+    query is re-executed. Every entry expires after `max_age` seconds, results
+    touching tables without statistics (views, ...) after `ttl`. Queries that
+    depend on the clock (now(), CURRENT_DATE, ...) or cannot be parsed (so
+    their tables are unknown) are never cached.
+    """
+
+    def __init__(self, max_entries: int, max_rows: int, watermark_interval: float, ttl: float, max_age: float):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.watermark_interval = watermark_interval
+        self.ttl = ttl
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._cached_rows = 0
+        self._watermarks = {}   # table -> (checked_at, watermark), guarded by _lock like the entries
+        self._lock = threading.Lock()
+        self._metrics = {"lookups": 0, "hits": 0, "misses": 0, "stale": 0, "evictions": 0, "uncacheable": 0}
+
+    def _split_due(self, tables):
+        """Split `tables` into fresh watermarks and tables whose watermark must be re-read."""
+        now = time.time()
+        watermarks = {}
+        due = []
+        with self._lock:
+            for table in tables:
+                checked_at, watermark = self._watermarks.get(table, (0, None))
+                if now - checked_at < self.watermark_interval:
+                    watermarks[table] = watermark
+                else:
+                    due.append(table)
+        return watermarks, due
+
+    def _record_watermarks(self, due, rows) -> dict:
+        # Tables missing from pg_stat_user_tables get None and fall back to the short ttl
+        counters = {row[0]: tuple(str(value) for value in row[1:]) for row in rows}
+        watermarks = {table: counters.get(table) for table in due}
+        now = time.time()
+        with self._lock:
+            for table, watermark in watermarks.items():
+                self._watermarks[table] = (now, watermark)
+        return watermarks
+
+    def _fetch_watermarks(self, tables) -> dict:
+        """Current watermark per table, re-read from Postgres at most every `watermark_interval`."""
+        watermarks, due = self._split_due(tables)
+        if due:
+            with span("postgres.watermarks", kind="postgres", tables=due), get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(WATERMARK_QUERY, (due,))
+                    watermarks.update(self._record_watermarks(due, cursor.fetchall()))
+        return watermarks
+
+    async def _afetch_watermarks(self, tables) -> dict:
+        watermarks, due = self._split_due(tables)
+        if due:
+            with span("postgres.watermarks", kind="postgres", tables=due):
+                async with get_async_connection() as conn:
+                    rows = await conn.fetch(AWATERMARK_QUERY, due)
+                watermarks.update(self._record_watermarks(due, [tuple(row) for row in rows]))
+        return watermarks
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._cached_rows > self.max_rows):
+            _, entry = self._entries.popitem(last=False)
+            self._cached_rows -= len(entry["result"])
+            self._metrics["evictions"] += 1
+
+    def _lookup(self, key: str, tables, watermarks: dict):
+        untracked = any(watermarks.get(table) is None for table in tables)
+        with self._lock:
+            self._metrics["lookups"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry["created_at"]
+                expired = age > self.max_age or (untracked and age > self.ttl)
+                if entry["watermarks"] == watermarks and not expired:
+                    self._entries.move_to_end(key)
+                    self._metrics["hits"] += 1
+                    self._trace_hit(True)
+                    return entry["result"]
+                self._metrics["stale"] += 1
+                self._cached_rows -= len(self._entries.pop(key)["result"])
+            self._metrics["misses"] += 1
+        self._trace_hit(False)
+        return None
+
+    @staticmethod
+    def _trace_hit(hit: bool):
+        node_span = current_span()
+        if node_span is not None:
+            node_span.set(result_cache_hit=hit)
+
+    def _store(self, key: str, result, watermarks: dict):
+        with self._lock:
+            if len(result) <= self.max_rows:
+                if key in self._entries:
+                    self._cached_rows -= len(self._entries.pop(key)["result"])
+                self._entries[key] = {"result": result, "watermarks": watermarks, "created_at": time.time()}
+                self._cached_rows += len(result)
+                self._evict()
+
+    def _cached_tables(self, query: str):
+        """
+        Tables to watermark for `query`, or None when it bypasses the cache:
+        clock-dependent SQL, or SQL whose tables cannot all be determined.
+        """
+        tables = None if is_volatile_sql(query) else extract_tables(query)
+        if tables is None:
+            with self._lock:
+                self._metrics["uncacheable"] += 1
+        return tables
+
+    def run(self, query: str):
+        """Return a cached result for `query` if still valid, otherwise execute and cache it."""
+        tables = self._cached_tables(query)
+        if tables is None:
+            return run_sql_query(query)
+        key = normalize_sql(query)
+        watermarks = self._fetch_watermarks(tables)
+        cached = self._lookup(key, tables, watermarks)
+        if cached is not None:
+            return cached
+
+        result = run_sql_query(query)
+        if not isinstance(result, SqlError):
+            self._store(key, result, watermarks)
+        return result
+
+    async def arun(self, query: str):
+        """Async variant of `run` using the asyncpg pool."""
+        tables = self._cached_tables(query)
+        if tables is None:
+            return await arun_sql_query(query)
+        key = normalize_sql(query)
+        watermarks = await self._afetch_watermarks(tables)
+        cached = self._lookup(key, tables, watermarks)
+        if cached is not None:
+            return cached
+
+        result = await arun_sql_query(query)
+        if not isinstance(result, SqlError):
+            self._store(key, result, watermarks)
+        return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics, size=len(self._entries), cached_rows=self._cached_rows)
+        metrics["hit_rate"] = metrics["hits"] / metrics["lookups"] if metrics["lookups"] else 0.0
+        return metrics
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_ROWS,
+    RESULT_CACHE_WATERMARK_INTERVAL,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_MAX_AGE,
+)
+
+
+def cached_run_sql_query(query):
+    """`run_sql_query` behind the result cache; errors are never cached."""
+    try:
+        return result_cache.run(query)
+    except Exception as e:
+        return SqlError("execute", str(e).strip())
+
+
+async def acached_run_sql_query(query):
+    """Async variant of `cached_run_sql_query`."""
+    try:
+        return await result_cache.arun(query)
+    except Exception as e:
+        return SqlError("execute", str(e).strip())
@@ -0,0 +1,59 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.query_result import QueryResult
+
+
+class ResultPager:
+    """
+    Server-side pages over a cached QueryResult.
+
+    Filtering and sorting produce an index array over the full result (recomputed
+    only when the filter or sort changes); a page is then a `take` of at most
+    `page_size` rows, so rendering cost follows the page size, not the result size.
+    """
+
+    def __init__(self, result: QueryResult):
+        self.result = result
+        self._view_key = None
+        self._order = np.arange(result.row_count)
+
+    def _filter_mask(self, text: str) -> np.ndarray:
+        needle = text.lower()
+        mask = np.zeros(self.result.row_count, dtype=bool)
+        for col in self.result.data:
+            mask |= pd.Series(col).astype(str).str.lower().str.contains(needle, regex=False).to_numpy()
+        return mask
+
+    def _sort_order(self, rows: np.ndarray, sort_by: str, descending: bool) -> np.ndarray:
+        values = pd.Series(self.result.column(sort_by)[rows])
+        try:
+            ordered = values.sort_values(ascending=not descending, na_position="last", kind="stable")
+        except TypeError:
+            # Mixed types in an object column, fall back to comparing their text
+            ordered = values.astype(str).sort_values(ascending=not descending, kind="stable")
+        return rows[ordered.index.to_numpy()]
+
+    def view(self, sort_by: Optional[str] = None, descending: bool = False, filter_text: str = "") -> np.ndarray:
+        """Row indices of the full result after filtering and sorting (cached per settings)."""
+        key = (sort_by, descending, filter_text)
+        if key != self._view_key:
+            rows = np.arange(self.result.row_count)
+            if filter_text:
+                rows = rows[self._filter_mask(filter_text)]
+            if sort_by in self.result.columns:
+                rows = self._sort_order(rows, sort_by, descending)
+            self._order, self._view_key = rows, key
+        return self._order
+
+    def page_count(self, page_size: int, **view_options) -> int:
+        return max(math.ceil(len(self.view(**view_options)) / page_size), 1)
+
+    def page(self, page: int, page_size: int, **view_options) -> QueryResult:
+        """Rows of the 1-based `page` of the filtered/sorted view."""
+        rows = self.view(**view_options)
+        start = (max(page, 1) - 1) * page_size
+        return self.result.take(rows[start:start + page_size])
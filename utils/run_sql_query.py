@@ -1,23 +1,89 @@
-from config import db
-import ast
-import psycopg2
+from utils.db_pool import get_connection
+from utils.async_db_pool import get_async_connection
+from utils.query_result import QueryResult
+from utils.sql_utils import SqlError, NARROW_QUERY_HINT
+from utils.tracing import span
+from config import QUERY_FETCH_BATCH_SIZE, QUERY_MAX_ROWS, SQL_QUERY_TIMEOUT_MS
 
-def run_sql_query(query):
-    """Execute SQL query and return results."""
+QUERY_CANCELED = "57014"  # SQLSTATE of a statement cancelled by statement_timeout
+
+
+def query_error(e: Exception, statement_timeout_ms: int) -> SqlError:
+    # psycopg2 errors carry `pgcode`, asyncpg errors `sqlstate`
+    if (getattr(e, "pgcode", None) or getattr(e, "sqlstate", None)) == QUERY_CANCELED:
+        return SqlError(
+            "timeout",
+            f"Query cancelled after {statement_timeout_ms / 1000:g}s (statement_timeout).",
+            NARROW_QUERY_HINT,
+        )
+    return SqlError("execute", str(e).strip())
+
+
+def run_sql_query(query, max_rows=QUERY_MAX_ROWS, batch_size=QUERY_FETCH_BATCH_SIZE, statement_timeout_ms=SQL_QUERY_TIMEOUT_MS):
+    """
+    Execute SQL query on a pooled connection and stream back at most `max_rows` rows.
+
+    Rows are pulled through a named (server-side) cursor in `batch_size` chunks, so
+    memory stays bounded no matter how large the underlying table is. The query's
+    transaction gets its own `statement_timeout` (SET LOCAL), tighter than the pool's.
+
+    Returns:
+        QueryResult: columnar result (with `truncated` set if the cap was hit), or a SqlError.
+    """
+    try:
+        with span("postgres.query", kind="postgres") as query_span, get_connection() as conn:
+            with conn.cursor() as settings:
+                settings.execute(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+            with conn.cursor(name="agent_query_cursor") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query)
+
+                rows = []
+                truncated = False
+                colnames = None
+                while True:
+                    batch = cursor.fetchmany(min(batch_size, max_rows + 1 - len(rows)))
+                    if colnames is None:
+                        # Get column names (only known after the first fetch on a named cursor)
+                        colnames = [desc[0] for desc in cursor.description]
+                    if not batch:
+                        break
+                    rows.extend(batch)
+                    if len(rows) > max_rows:
+                        rows = rows[:max_rows]
+                        truncated = True
+                        break
+            query_span.set(rows=len(rows), truncated=truncated)
+
+        # Build the columnar result once; every consumer reads it directly
+        return QueryResult.from_rows(colnames, rows, truncated=truncated)
+    except Exception as e:
+        return query_error(e, statement_timeout_ms)
+
+
+async def arun_sql_query(query, max_rows=QUERY_MAX_ROWS, batch_size=QUERY_FETCH_BATCH_SIZE, statement_timeout_ms=SQL_QUERY_TIMEOUT_MS):
+    """Async variant of `run_sql_query` on the asyncpg pool, with the same streaming and row cap."""
     try:
-        conn = psycopg2.connect(database="fintrack", user="postgres", password="App4ever#", host="localhost", port="5432")
-        cursor = conn.cursor()
-        cursor.execute(query)
-        # Get column names
-        colnames = [desc[0] for desc in cursor.description]
-
-        # Get rows
-        rows = cursor.fetchall()
-        conn.close()
-
-        # Convert to list of dictionaries
-        result = [dict(zip(colnames, row)) for row in rows]
-        conn.close()
-        return result
+        with span("postgres.query", kind="postgres") as query_span:
+            async with get_async_connection() as conn, conn.transaction(readonly=True):
+                await conn.execute(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+                statement = await conn.prepare(query)
+                colnames = [attr.name for attr in statement.get_attributes()]
+                cursor = await statement.cursor()
+
+                rows = []
+                truncated = False
+                while True:
+                    batch = await cursor.fetch(min(batch_size, max_rows + 1 - len(rows)))
+                    if not batch:
+                        break
+                    rows.extend(tuple(record) for record in batch)
+                    if len(rows) > max_rows:
+                        rows = rows[:max_rows]
+                        truncated = True
+                        break
+            query_span.set(rows=len(rows), truncated=truncated)
+
+        return QueryResult.from_rows(colnames, rows, truncated=truncated)
     except Exception as e:
-        return f"Error executing query: {e}"
\ No newline at end of file
+        return query_error(e, statement_timeout_ms)
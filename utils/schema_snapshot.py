@@ -0,0 +1,146 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import graph, SCHEMA_REFRESH_INTERVAL
+from utils.format_final_response import format_schema_to_string
+from utils.tracing import span
+
+TABLES_QUERY = """
+MATCH (t:Table)
+OPTIONAL MATCH (t)-[:CONTAINS]->(f:Field)
+RETURN t.name AS table_name, properties(t) AS table_properties, collect(properties(f)) AS fields
+ORDER BY table_name
+"""
+
+EDGES_QUERY = """
+MATCH (a:Table)-[r:REFERENCES|RECEIVES]->(b:Table)
+RETURN a.name AS source, type(r) AS type, b.name AS target
+ORDER BY source, type, target
+"""
+
+
+class SchemaSnapshot:
+    """
+    Local copy of the Neo4j schema graph (Table/Field nodes, REFERENCES/RECEIVES edges).
+
+    Loaded once at startup and resolved in memory, so a request needs neither an
+    LLM-written Cypher query nor a Neo4j round trip. The snapshot is re-read every
+    `refresh_interval` seconds and swapped in only when its content hash changes.
+    """
+
+    def __init__(self, graph, refresh_interval: float):
+        self.graph = graph
+        self.refresh_interval = refresh_interval
+        self.tables: Dict[str, dict] = {}
+        self.references: Dict[str, List[str]] = {}
+        self.schema_hash: Optional[str] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _load(self):
+        with span("neo4j.schema_snapshot", kind="neo4j"):
+            table_rows = self.graph.query(TABLES_QUERY)
+            edge_rows = self.graph.query(EDGES_QUERY)
+        schema_hash = hashlib.sha256(
+            json.dumps([table_rows, edge_rows], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return table_rows, edge_rows, schema_hash
+
+    def refresh(self):
+        """Reload from Neo4j; rebuild the in-memory graph only if the schema hash changed."""
+        try:
+            table_rows, edge_rows, schema_hash = self._load()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load schema snapshot from Neo4j. Error: {e}")
+            self._loaded_at = time.time()
+            return
+
+        with self._lock:
+            self._loaded_at = time.time()
+            if schema_hash == self.schema_hash:
+                return
+
+            tables = {}
+            for row in table_rows:
+                fields = [f for f in row["fields"] if f]
+                tables[row["table_name"].lower()] = {
+                    "table_name": row["table_name"],
+                    "properties": row.get("table_properties") or {},
+                    "fields": fields,
+                }
+
+            # A REFERENCES B: A holds a foreign key to B. B RECEIVES A: same link, seen from B.
+            references = {name: [] for name in tables}
+            for edge in edge_rows:
+                source, target = edge["source"].lower(), edge["target"].lower()
+                if edge["type"] == "RECEIVES":
+                    source, target = target, source
+                if source in references and target not in references[source]:
+                    references[source].append(target)
+
+            self.tables = tables
+            self.references = references
+            self.schema_hash = schema_hash
+            print(f"Schema snapshot loaded: {len(tables)} tables (hash {schema_hash[:12]})")
+
+    def _maybe_refresh(self):
+        if time.time() - self._loaded_at >= self.refresh_interval:
+            self.refresh()
+
+    def _table_terms(self, table: dict) -> List[str]:
+        name = table["table_name"]
+        terms = [name, name.replace("_", " ")]
+        aliases = table["properties"].get("aliases") or []
+        if isinstance(aliases, str):
+            aliases = [aliases]
+        return terms + list(aliases)
+
+    def find_tables(self, text: str) -> List[str]:
+        """Tables mentioned by name or alias in `text`, in order of first mention."""
+        positions = {}
+        for key, table in self.tables.items():
+            for term in self._table_terms(table):
+                match = re.search(rf"\b{re.escape(term)}\b", text, re.IGNORECASE)
+                if match:
+                    positions[key] = min(match.start(), positions.get(key, match.start()))
+        return sorted(positions, key=positions.get)
+
+    def resolve(self, cypher_details: str) -> Optional[list]:
+        """
+        Relevant tables plus their foreign-key neighbours, shaped like the
+        GraphCypherQAChain result consumed by `format_schema_to_string`.
+        Returns None when no known table is mentioned.
+        """
+        self._maybe_refresh()
+        with self._lock:
+            primary = self.find_tables(cypher_details or "")
+            if not primary:
+                return None
+
+            related = []
+            for key in primary:
+                for neighbour in self.references.get(key, []):
+                    if neighbour not in primary and neighbour not in related and neighbour in self.tables:
+                        related.append(neighbour)
+
+            def table_entry(key):
+                table = self.tables[key]
+                return {"table_name": table["table_name"], "fields": table["fields"]}
+
+            return [{"result": {
+                "primary_tables": [table_entry(key) for key in primary],
+                "related_tables": [table_entry(key) for key in related],
+            }}]
+
+    def schema_string(self, cypher_details: str) -> Optional[str]:
+        """Same text `format_schema_to_string` produces for the Cypher chain, or None."""
+        schema = self.resolve(cypher_details)
+        return format_schema_to_string(schema) if schema else None
+
+
+schema_snapshot = SchemaSnapshot(graph, SCHEMA_REFRESH_INTERVAL)
@@ -0,0 +1,204 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_SAVE_DELAY,
+)
+
+
+class SemanticQueryCache:
+    """
+    Persistent cache mapping the embedding of a user question to the SQL that
+    was generated (and successfully executed) for it.
+
+    A lookup returns the most similar cached question if its cosine similarity
+    clears `threshold`. Entries expire after `ttl` seconds and the least recently
+    used ones are evicted once `max_entries` is exceeded.
+
+    The normalized embeddings live in a preallocated matrix whose row i belongs
+    to entry i, so a store or removal touches one row. Changes are written by a
+    background timer at most every `save_delay` seconds: the entries as JSON,
+    the vectors as a .npy file next to it.
+    """
+
+    def __init__(self, path: str, threshold: float, ttl: float, max_entries: int, save_delay: float):
+        self.path = path
+        self.vectors_path = os.path.splitext(path)[0] + ".npy"
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._entries: List[dict] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._save_timer: Optional[threading.Timer] = None
+        self._metrics = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            if entries and "embedding" in entries[0]:
+                # Older single-file format with the vectors inline
+                vectors = np.vstack([self._normalize(e.pop("embedding")) for e in entries])
+            elif entries:
+                vectors = np.load(self.vectors_path)
+                if len(vectors) != len(entries):
+                    raise ValueError(f"{len(entries)} entries but {len(vectors)} vectors")
+            else:
+                vectors = np.zeros((0, 0), dtype=np.float32)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Could not load semantic cache from {self.path}. Error: {e}")
+            return
+        self._entries = entries[:self.max_entries]
+        if self._entries:
+            self._allocate(vectors.shape[1])
+            self._matrix[:len(self._entries)] = vectors[:len(self._entries)]
+        self._expire(time.time())
+
+    def _allocate(self, dim: int):
+        self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+
+    def _schedule_save(self):
+        # Called with the lock held; one pending save covers every change until it runs
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes now (also run at interpreter exit)."""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            entries = [dict(e) for e in self._entries]
+            vectors = self._matrix[:len(entries)].copy()
+        try:
+            # Vectors first: a crash in between leaves a row-count mismatch, never wrong vectors
+            with open(self.vectors_path + ".tmp", "wb") as f:
+                np.save(f, vectors)
+            os.replace(self.vectors_path + ".tmp", self.vectors_path)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(entries, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not save semantic cache to {self.path}. Error: {e}")
+
+    def _remove(self, index: int):
+        # Swap-remove: the last entry (and its row) takes the freed slot
+        last = len(self._entries) - 1
+        if index != last:
+            self._entries[index] = self._entries[last]
+            self._matrix[index] = self._matrix[last]
+        self._entries.pop()
+
+    def _expire(self, now: float) -> bool:
+        expired = [i for i, e in enumerate(self._entries) if now - e["created_at"] > self.ttl]
+        # Highest index first, so every swapped-in entry has already been checked
+        for index in reversed(expired):
+            self._remove(index)
+        self._metrics["evictions"] += len(expired)
+        return bool(expired)
+
+    def lookup(self, embedding) -> Optional[dict]:
+        """Return the cached entry closest to `embedding`, or None on a miss."""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._metrics["lookups"] += 1
+            if self._expire(now):
+                self._schedule_save()
+            if not self._entries or self._matrix.shape[1] != query.shape[0]:
+                self._metrics["misses"] += 1
+                return None
+
+            scores = self._matrix[:len(self._entries)] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self._metrics["misses"] += 1
+                return None
+
+            entry = self._entries[best]
+            entry["last_used"] = now
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._metrics["hits"] += 1
+            return dict(entry, similarity=float(scores[best]))
+
+    def store(self, embedding, user_query: str, sql_query: str, db_query: str, general_query: str):
+        """Remember validated SQL for a question, evicting the LRU entry when full."""
+        vector = self._normalize(embedding)
+        now = time.time()
+        entry = {
+            "user_query": user_query,
+            "sql_query": sql_query,
+            "db_query": db_query,
+            "general_query": general_query,
+            "created_at": now,
+            "last_used": now,
+            "hits": 0,
+        }
+        with self._lock:
+            if self._matrix.shape[1] != vector.shape[0]:
+                # First entry, or the embedding model changed: older vectors are not comparable
+                self._metrics["evictions"] += len(self._entries)
+                self._entries = []
+                self._allocate(vector.shape[0])
+
+            # Replace an existing entry for the same question instead of duplicating it
+            index = next((i for i, e in enumerate(self._entries) if e["user_query"] == user_query), None)
+            if index is None and len(self._entries) >= self.max_entries:
+                index = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+                self._metrics["evictions"] += 1
+            if index is None:
+                index = len(self._entries)
+                self._entries.append(entry)
+            else:
+                self._entries[index] = entry
+            self._matrix[index] = vector
+            self._metrics["stores"] += 1
+            self._schedule_save()
+
+    def invalidate(self, user_query: str):
+        """Drop the entry whose cached SQL no longer executes."""
+        with self._lock:
+            index = next((i for i, e in enumerate(self._entries) if e["user_query"] == user_query), None)
+            if index is not None:
+                self._remove(index)
+                self._schedule_save()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics, size=len(self._entries))
+        metrics["hit_rate"] = metrics["hits"] / metrics["lookups"] if metrics["lookups"] else 0.0
+        return metrics
+
+
+semantic_cache = SemanticQueryCache(
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_SAVE_DELAY,
+)
@@ -0,0 +1,99 @@
+import re
+from typing import List, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Functions whose value changes between executions of the same query text
+_VOLATILE_PATTERN = re.compile(
+    r"\b(?:now|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|random|gen_random_uuid)\s*\("
+    r"|\b(?:current_date|current_time|current_timestamp|localtime|localtimestamp)\b",
+    re.IGNORECASE,
+)
+
+# Repair hint for queries stopped for their cost (cost guard, statement_timeout)
+NARROW_QUERY_HINT = "Filter on a time range, hierarchy or cloud provider, aggregate instead of listing rows, and avoid cross joins."
+
+
+class SqlError:
+    """
+    Structured failure of a generated query, returned in place of a result.
+
+    `stage` is where it was caught: "parse", "statement" (not a single
+    read-only SELECT), "catalog" (unknown table/column), "explain" (rejected
+    by the Postgres planner), "cost" (planner estimate over the cost guard),
+    "execute" or "timeout" (cancelled by statement_timeout). Its text is what
+    the SQL repair prompt sees as the database error.
+    """
+
+    def __init__(self, stage: str, message: str, hint: Optional[str] = None):
+        self.stage = stage
+        self.message = message
+        self.hint = hint
+
+    @property
+    def executed(self) -> bool:
+        """Whether the query ran on Postgres before failing."""
+        return self.stage in ("execute", "timeout")
+
+    @property
+    def too_expensive(self) -> bool:
+        """Rejected by the cost guard or cancelled by statement_timeout."""
+        return self.stage in ("cost", "timeout")
+
+    def __str__(self) -> str:
+        prefix = "Error executing query" if self.executed else f"Error validating query ({self.stage})"
+        text = f"{prefix}: {self.message}"
+        return f"{text}\nHint: {self.hint}" if self.hint else text
+
+    def __repr__(self) -> str:
+        return f"SqlError(stage={self.stage!r}, message={self.message!r})"
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Canonical form of a SQL statement for cache keys.
+
+    Comments are dropped, whitespace collapsed, keywords/identifiers lower-cased
+    and trailing semicolons removed, while quoted literals are left untouched.
+    """
+    parts = _LITERAL_PATTERN.split(query.strip())
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:  # quoted literal or identifier
+            normalized.append(part)
+        else:
+            part = _COMMENT_PATTERN.sub(" ", part)
+            normalized.append(re.sub(r"\s+", " ", part).lower())
+    return "".join(normalized).strip().rstrip(";").strip()
+
+
+def extract_tables(query: str) -> Optional[List[str]]:
+    """
+    Table names the query reads (CTE names excluded), taken from its parse tree
+    so comma joins, subqueries and CTE bodies are all covered. None when the
+    query cannot be parsed.
+    """
+    try:
+        tree = normalize_identifiers(sqlglot.parse_one(query, read="postgres"), dialect="postgres")
+    except SqlglotError:
+        return None
+    ctes = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    tables = []
+    for table in tree.find_all(exp.Table):
+        name = table.name
+        if not name or (name in ctes and not table.db):
+            continue  # table function (generate_series, ...) or CTE
+        if name not in tables:
+            tables.append(name)
+    return tables
+
+
+def is_volatile_sql(query: str) -> bool:
+    """Whether the result depends on the clock or randomness (now(), CURRENT_DATE, random(), ...)."""
+    stripped = _LITERAL_PATTERN.sub("''", _COMMENT_PATTERN.sub(" ", query))
+    return bool(_VOLATILE_PATTERN.search(stripped))
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import OptimizeError, ParseError
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+from sqlglot.optimizer.qualify_columns import qualify_columns, validate_qualify_columns
+from sqlglot.schema import MappingSchema
+
+from config import (
+    QUERY_MAX_ROWS,
+    SQL_CATALOG_REFRESH_INTERVAL,
+    SQL_GUARD_LIMIT_ROWS,
+    SQL_GUARD_MAX_COST,
+    SQL_VALIDATE_EXPLAIN,
+)
+from utils.db_pool import get_connection, PoolTimeoutError
+from utils.async_db_pool import get_async_connection
+from utils.sql_utils import SqlError, NARROW_QUERY_HINT
+from utils.tracing import span
+
+CATALOG_QUERY = """
+SELECT table_schema, table_name, column_name
+FROM information_schema.columns
+WHERE table_schema = current_schema()
+ORDER BY table_name, ordinal_position
+"""
+
+EXPLAIN_PREFIX = "EXPLAIN (FORMAT JSON) "
+_TRAILING_SEMICOLONS = re.compile(r"[;\s]+$")
+
+# Statements (also nested, e.g. in a CTE) that write or change the database
+WRITE_EXPRESSIONS = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+    exp.Alter, exp.TruncateTable, exp.Command, exp.Into,
+)
+
+
+class SchemaCatalog:
+    """
+    Table -> column names of the live database, read from information_schema,
+    plus the schema they live in so schema-qualified names (public.hierarchy)
+    resolve too.
+
+    Loaded on first use and re-read every `refresh_interval` seconds. While it
+    cannot be loaded the catalog is empty and table/column checks are skipped;
+    Postgres still rejects unknown names at EXPLAIN or execution time.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.tables: Dict[str, Dict[str, str]] = {}
+        self.schemas: Set[str] = set()
+        self.schema: Optional[MappingSchema] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        return time.time() - self._loaded_at >= self.refresh_interval
+
+    def _swap(self, rows):
+        tables, schemas = {}, set()
+        for table_schema, table_name, column_name in rows:
+            schemas.add(table_schema.lower())
+            # Column types are not needed to resolve names
+            tables.setdefault(table_name.lower(), {})[column_name.lower()] = "text"
+        self.tables, self.schemas = tables, schemas
+        self.schema = MappingSchema(tables, dialect="postgres") if tables else None
+
+    def _load_failed(self, e: Exception):
+        print(f"⚠️ Warning: Could not load the SQL catalog from information_schema. Error: {e}")
+
+    def get(self) -> "SchemaCatalog":
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    try:
+                        with span("postgres.catalog", kind="postgres"), get_connection() as conn:
+                            with conn.cursor() as cursor:
+                                cursor.execute(CATALOG_QUERY)
+                                self._swap(cursor.fetchall())
+                    except Exception as e:
+                        self._load_failed(e)
+                    self._loaded_at = time.time()
+        return self
+
+    async def aget(self) -> "SchemaCatalog":
+        if self._is_stale():
+            # Claim the reload so concurrent requests keep using the current catalog
+            self._loaded_at = time.time()
+            try:
+                with span("postgres.catalog", kind="postgres"):
+                    async with get_async_connection() as conn:
+                        self._swap([tuple(row) for row in await conn.fetch(CATALOG_QUERY)])
+            except Exception as e:
+                self._load_failed(e)
+        return self
+
+
+schema_catalog = SchemaCatalog(SQL_CATALOG_REFRESH_INTERVAL)
+
+
+def parse_select(query: Optional[str]) -> Tuple[Optional[exp.Expression], Optional[SqlError]]:
+    """Parse `query` as Postgres SQL and make sure it is exactly one read-only SELECT."""
+    if not query or not query.strip():
+        return None, SqlError("parse", "No SQL statement was generated.", "Return the query in a ```sql``` code block.")
+    try:
+        statements = [statement for statement in sqlglot.parse(query, read="postgres") if statement is not None]
+    except ParseError as e:
+        error = e.errors[0] if e.errors else {}
+        return None, SqlError(
+            "parse",
+            f"{error.get('description', e)} near \"{error.get('highlight', '')}\" "
+            f"(line {error.get('line', '?')}, column {error.get('col', '?')})",
+        )
+
+    if len(statements) != 1:
+        return None, SqlError("statement", f"Expected a single statement, got {len(statements)}.")
+    tree = statements[0]
+    if not isinstance(tree, (exp.Select, exp.SetOperation)):
+        return None, SqlError("statement", f"Only SELECT queries are allowed, got {tree.key.upper()}.")
+    write = tree.find(*WRITE_EXPRESSIONS)
+    if write is not None:
+        return None, SqlError("statement", f"Only read-only SELECT queries are allowed, found {write.key.upper()}.")
+    return tree, None
+
+
+def check_catalog(tree: exp.Expression, catalog: SchemaCatalog) -> Optional[SqlError]:
+    """Every referenced table and column must exist in the catalog (qualifies `tree` in place)."""
+    if not catalog.tables:
+        return None
+
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    referenced = []
+    for table in tree.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or (name in cte_names and not table.db):
+            continue  # table function (generate_series, ...) or CTE
+        if (table.db and table.db.lower() not in catalog.schemas) or name not in catalog.tables:
+            return SqlError(
+                "catalog",
+                f'Unknown table "{".".join(part for part in (table.db, table.name) if part)}".',
+                f"Available tables: {', '.join(sorted(catalog.tables))}",
+            )
+        referenced.append(name)
+
+    try:
+        # The column steps of sqlglot's qualify(), without the rewrites only needed to transpile
+        validate_qualify_columns(qualify_columns(normalize_identifiers(tree, dialect="postgres"), schema=catalog.schema))
+    except OptimizeError as e:
+        message = str(e)
+        if not any(marker in message for marker in ("could not be resolved", "Unknown column", "Ambiguous column")):
+            return None  # Construct sqlglot cannot follow; leave it to EXPLAIN
+        hint = "; ".join(
+            f"{name}({', '.join(catalog.tables[name])})" for name in dict.fromkeys(referenced)
+        )
+        return SqlError("catalog", message, f"Columns of the referenced tables: {hint}" if hint else None)
+    return None
+
+
+def local_checks(query: Optional[str], catalog: SchemaCatalog) -> Tuple[Optional[exp.Expression], Optional[SqlError]]:
+    tree, error = parse_select(query)
+    return tree, error if error is not None else check_catalog(tree, catalog)
+
+
+def _plan_estimate(plan) -> Tuple[float, float]:
+    """Total cost and row estimate of the top node of an EXPLAIN (FORMAT JSON) plan."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)  # asyncpg returns json columns as text, psycopg2 parses them
+    top = plan[0]["Plan"]
+    return float(top["Total Cost"]), float(top["Plan Rows"])
+
+
+def explain_sql(query: str) -> Tuple[Optional[Tuple[float, float]], Optional[SqlError]]:
+    """
+    Plan the query without running it. Returns the planner's (cost, rows)
+    estimate, or a SqlError for planner errors (types, operators, ...).
+    """
+    try:
+        with span("postgres.explain", kind="postgres") as explain_span, get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(EXPLAIN_PREFIX + query)
+                cost, rows = _plan_estimate(cursor.fetchone()[0])
+            explain_span.set(cost=cost, estimated_rows=rows)
+    except PoolTimeoutError as e:
+        # Not the query's fault; run_query will wait for a connection again
+        print(f"⚠️ Warning: Skipping EXPLAIN. Error: {e}")
+        return None, None
+    except Exception as e:
+        return None, SqlError("explain", str(e).strip())
+    return (cost, rows), None
+
+
+async def aexplain_sql(query: str) -> Tuple[Optional[Tuple[float, float]], Optional[SqlError]]:
+    try:
+        with span("postgres.explain", kind="postgres") as explain_span:
+            async with get_async_connection() as conn:
+                cost, rows = _plan_estimate(await conn.fetchval(EXPLAIN_PREFIX + query))
+            explain_span.set(cost=cost, estimated_rows=rows)
+    except asyncio.TimeoutError as e:
+        print(f"⚠️ Warning: Skipping EXPLAIN. Error: {e}")
+        return None, None
+    except Exception as e:
+        return None, SqlError("explain", str(e).strip())
+    return (cost, rows), None
+
+
+def limited_query(query: str, tree: exp.Expression, estimate: Tuple[float, float]) -> Optional[str]:
+    """
+    `query` with LIMIT QUERY_MAX_ROWS + 1 appended when the planner expects
+    more than SQL_GUARD_LIMIT_ROWS rows and the query has no LIMIT/FETCH.
+    The extra row still lets run_sql_query flag the result as truncated.
+    """
+    _, rows = estimate
+    if rows <= SQL_GUARD_LIMIT_ROWS or tree.args.get("limit") is not None:
+        return None
+    # Appended as text so the query runs exactly as generated otherwise
+    return f"{_TRAILING_SEMICOLONS.sub('', query)}\nLIMIT {QUERY_MAX_ROWS + 1}"
+
+
+def check_cost(estimate: Tuple[float, float]) -> Optional[SqlError]:
+    cost, rows = estimate
+    if cost <= SQL_GUARD_MAX_COST:
+        return None
+    return SqlError(
+        "cost",
+        f"Estimated cost {cost:,.0f} exceeds the limit of {SQL_GUARD_MAX_COST:,.0f} (about {rows:,.0f} rows).",
+        NARROW_QUERY_HINT,
+    )
+
+
+def validate_sql(query: Optional[str]) -> Tuple[Optional[str], Optional[SqlError]]:
+    """
+    Check a generated query before execution. Local checks (parse, single
+    read-only SELECT, tables/columns against the catalog) run first and cost
+    no database connection; only queries that pass them are EXPLAINed, and
+    the plan estimate is held against the cost guard.
+
+    Returns:
+        (query to run, None) — possibly with an added LIMIT — or (query, SqlError).
+    """
+    tree, error = local_checks(query, schema_catalog.get())
+    if error is not None or not SQL_VALIDATE_EXPLAIN:
+        return query, error
+
+    estimate, error = explain_sql(query)
+    if estimate is None:
+        return query, error
+    limited = limited_query(query, tree, estimate)
+    if limited is not None:
+        limited_estimate, _ = explain_sql(limited)
+        if limited_estimate is not None:  # Keep the query as generated if the rewrite does not plan
+            query, estimate = limited, limited_estimate
+    return query, check_cost(estimate)
+
+
+async def avalidate_sql(query: Optional[str]) -> Tuple[Optional[str], Optional[SqlError]]:
+    """Async variant of `validate_sql` on the asyncpg pool."""
+    tree, error = local_checks(query, await schema_catalog.aget())
+    if error is not None or not SQL_VALIDATE_EXPLAIN:
+        return query, error
+
+    estimate, error = await aexplain_sql(query)
+    if estimate is None:
+        return query, error
+    limited = limited_query(query, tree, estimate)
+    if limited is not None:
+        limited_estimate, _ = await aexplain_sql(limited)
+        if limited_estimate is not None:
+            query, estimate = limited, limited_estimate
+    return query, check_cost(estimate)
@@ -0,0 +1,182 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import TRACE_ENABLED, TRACE_PATH
+
+
+class Span:
+    """One timed operation of a request: a graph node or an external call."""
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"] = None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        trace_sink.write(self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class JsonlSink:
+    """Appends finished spans to a local JSONL file, one object per line."""
+
+    def __init__(self, path: str, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        if not self.enabled:
+            return
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+trace_sink = JsonlSink(TRACE_PATH, TRACE_ENABLED)
+
+# Innermost open span of the current request; copied into LangGraph worker
+# threads and asyncio tasks, so child spans find their parent automatically
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Time the enclosed block as a child of the current span (or as a new trace)."""
+    current = Span(name, kind, _current_span.get(), **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def _node_update_attributes(update) -> dict:
+    """Row count and error flag from a node's returned state update."""
+    if isinstance(update, dict):
+        query_result, error = update.get("query_result"), update.get("error")
+    else:
+        query_result, error = getattr(update, "query_result", None), getattr(update, "error", None)
+    attributes = {"error": bool(error)}
+    if query_result is not None:
+        attributes["rows"] = len(query_result)
+        attributes["truncated"] = query_result.truncated
+    return attributes
+
+
+def traced_node(name: str, func):
+    """Wrap a sync or async graph node so each call is recorded as a `node` span."""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(state):
+            with span(name, kind="node", iteration=state.loop_count) as node_span:
+                update = await func(state)
+                node_span.set(**_node_update_attributes(update))
+                return update
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state):
+        with span(name, kind="node", iteration=state.loop_count) as node_span:
+            update = func(state)
+            node_span.set(**_node_update_attributes(update))
+            return update
+    return wrapper
+
+
+def _token_usage(response) -> dict:
+    """Prompt/completion token counts from an Ollama LLMResult (generation_info or usage_metadata)."""
+    for generations in response.generations:
+        for generation in generations:
+            info = generation.generation_info or {}
+            if "prompt_eval_count" in info or "eval_count" in info:
+                return {
+                    "prompt_tokens": info.get("prompt_eval_count"),
+                    "completion_tokens": info.get("eval_count"),
+                }
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {
+                    "prompt_tokens": usage.get("input_tokens"),
+                    "completion_tokens": usage.get("output_tokens"),
+                }
+    return {}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records every LLM call made inside a traced request as an `llm` span,
+    with its model, duration and prompt/completion token counts.
+    """
+
+    # Run in the caller's context (also for async calls) so the parent span is visible
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[uuid.UUID, Span] = {}
+
+    def _start(self, serialized, run_id, tags, metadata):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model")
+        self._spans[run_id] = Span("ollama.chat", "llm", _current_span.get(), model=model, tags=tags or [])
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, metadata=None, **kwargs):
+        self._start(serialized, run_id, tags, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, metadata=None, **kwargs):
+        self._start(serialized, run_id, tags, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.set(**_token_usage(response))
+            llm_span.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.error = f"{type(error).__name__}: {error}"
+            llm_span.finish()
+
+
+tracing_callback = TracingCallbackHandler()
@@ -2,6 +2,9 @@ from chromadb import PersistentClient, EmbeddingFunction, Embeddings
 from langchain_ollama import OllamaEmbeddings
 from typing import List
 import json
+import hashlib
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_WORKERS
+from utils.embedding_cache import CachedEmbeddings
 
 
 DB_PATH = './.chroma_db'
@@ -23,37 +26,76 @@ class QuestionAnswerPairs:
         self.answer = answer
 
 class CustomEmbeddingClass(EmbeddingFunction):
-    def __init__(self):
-        self.embedding_model = OllamaEmbeddings(model="nomic-embed-text")
+    def __init__(self, batch_size: int = EMBEDDING_BATCH_SIZE, max_workers: int = EMBEDDING_MAX_WORKERS):
+        # Batched embed_documents calls, with a content-hash cache on disk so
+        # unchanged texts are never re-embedded across restarts
+        self.embedding_model = CachedEmbeddings(
+            OllamaEmbeddings(model="nomic-embed-text"),
+            cache_path=EMBEDDING_CACHE_PATH,
+            batch_size=batch_size,
+            max_workers=max_workers,
+        )
 
     def __call__(self, input: List[str]) -> List[List[float]]:
-        return [self.embedding_model.embed_query(text) for text in input]
+        return self.embedding_model.embed_documents(input)
 
 
 class VectorStore:
     def __init__(self):
         db = PersistentClient(path=DB_PATH)
 
-        custom_embedding_function = CustomEmbeddingClass()
+        self.embedding_function = CustomEmbeddingClass()
 
-        self.faq_collection = db.get_or_create_collection(name='FAQ', embedding_function=custom_embedding_function)
+        self.faq_collection = db.get_or_create_collection(name='FAQ', embedding_function=self.embedding_function)
         # self.inventory_collection = db.get_or_create_collection(name='Inventory', embedding_function=custom_embedding_function)
 
-        if self.faq_collection.count() == 0:
-            self._load_faq_collection(FAQ_FILE_PATH)
+        self.sync_faq_collection(FAQ_FILE_PATH)
 
         # if self.inventory_collection.count() == 0:
         #     self._load_inventory_collection(INVENTORY_FILE_PATH)
 
-    def _load_faq_collection(self, faq_file_path: str):
+    @staticmethod
+    def _faq_documents(faqs: List[dict]) -> dict:
+        """Question and answer documents keyed by a stable content-hash id."""
+        documents = {}
+        for faq in faqs:
+            pair = json.dumps(faq, sort_keys=True)
+            for kind in ('question', 'answer'):
+                doc_id = hashlib.sha256(f"{kind}\x00{pair}".encode('utf-8')).hexdigest()
+                documents[doc_id] = (faq[kind], faq)
+        return documents
+
+    def sync_faq_collection(self, faq_file_path: str) -> dict:
+        """
+        Bring the FAQ collection in line with the FAQ file: add new or changed
+        entries, delete removed ones, leave unchanged documents untouched.
+        """
         with open(faq_file_path, 'r') as f:
             faqs = json.load(f)
 
-        self.faq_collection.add(
-            documents=[faq['question'] for faq in faqs] + [faq['answer'] for faq in faqs],
-            ids=[str(i) for i in range(0, 2*len(faqs))],
-            metadatas = faqs + faqs
-        )
+        desired = self._faq_documents(faqs)
+        existing = set(self.faq_collection.get(include=[])['ids'])
+        to_add = [doc_id for doc_id in desired if doc_id not in existing]
+        to_delete = [doc_id for doc_id in existing if doc_id not in desired]
+
+        computed_before = self.embedding_function.embedding_model.computed
+        if to_add:
+            self.faq_collection.upsert(
+                documents=[desired[doc_id][0] for doc_id in to_add],
+                ids=to_add,
+                metadatas=[desired[doc_id][1] for doc_id in to_add]
+            )
+        if to_delete:
+            self.faq_collection.delete(ids=to_delete)
+
+        report = {
+            'added': len(to_add),
+            'deleted': len(to_delete),
+            'unchanged': len(desired) - len(to_add),
+            'embeddings_computed': self.embedding_function.embedding_model.computed - computed_before,
+        }
+        print(f"FAQ collection sync: {report}")
+        return report
 
     # def _load_inventory_collection(self, inventory_file_path: str):
     #     with open(inventory_file_path, 'r') as f: